@@ -0,0 +1,714 @@
+#!/usr/bin/env python3
+"""
+Shared helpers for the MediaPipe detector workers
+(hand-detection.py / pose-detection.py)
+"""
+
+import os
+import re
+import sys
+import json
+import zlib
+import ctypes
+import struct
+import cv2
+import numpy as np
+
+# Cores / OpenCV threads the process was started with, so a later config can restore them
+_INITIAL_AFFINITY = os.sched_getaffinity(0) if hasattr(os, "sched_getaffinity") else None
+_INITIAL_OPENCV_THREADS = cv2.getNumThreads()
+
+
+def _parse_cpu_list(value):
+    """
+    Parse a core list from config
+    Accepts [0, 1, 2], "0-2,4" or a single int
+    """
+    if value is None:
+        return None
+
+    if isinstance(value, int):
+        return {value}
+
+    cores = set()
+    if isinstance(value, str):
+        for part in value.split(','):
+            part = part.strip()
+            if not part:
+                continue
+            if '-' in part:
+                start, end = part.split('-', 1)
+                cores.update(range(int(start), int(end) + 1))
+            else:
+                cores.add(int(part))
+    else:
+        cores.update(int(core) for core in value)
+
+    return cores
+
+
+def _set_process_affinity(cores):
+    """
+    Pin every thread of this process to the given cores
+    os.sched_setaffinity(0) only affects the calling thread on Linux,
+    so threads already started by MediaPipe/OpenCV are updated one by one
+    """
+    try:
+        thread_ids = [int(tid) for tid in os.listdir('/proc/self/task')]
+    except OSError:
+        thread_ids = [0]
+
+    for tid in thread_ids:
+        try:
+            os.sched_setaffinity(tid, cores)
+        except (ProcessLookupError, PermissionError):
+            # Thread exited in the meantime or is not ours to move
+            pass
+
+
+def _parse_thread_count(value, name, minimum):
+    """Parse one thread count from config, raising ValueError with the key name"""
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise ValueError(f"threads.{name} must be an integer, got {value!r}")
+    if value < minimum:
+        raise ValueError(f"threads.{name} must be >= {minimum}, got {value}")
+    return value
+
+
+def apply_thread_config(config):
+    """
+    Apply CPU thread budget and core affinity for this detector process
+
+    Config keys (all optional):
+        threads: {"opencv": int, "inference": int}
+        affinity: list of core ids or "0-1,3" style string
+
+    Must be called before the MediaPipe graph is created so that the
+    inference thread pool inherits the affinity mask. Invalid values are
+    reported in "warnings" and skipped; they never stop the worker.
+
+    Returns:
+        dict with the effective settings ("inference" is the number of cores
+        the worker is limited to, or None when no limit is enforced)
+    """
+    config = config or {}
+    warnings = []
+
+    threads = config.get("threads")
+    if threads is None:
+        threads = {}
+    elif not isinstance(threads, dict):
+        warnings.append(f"threads must be an object, got {threads!r}")
+        threads = {}
+
+    # The mp.solutions graphs do not expose the TFLite/XNNPACK thread count,
+    # so the inference budget is enforced by limiting the cores we run on.
+    # Only applied together with an explicit affinity: picking cores on our
+    # own would put every worker on the same lowest-numbered cores.
+    inference_threads = None
+    if threads.get("inference") is not None:
+        try:
+            inference_threads = _parse_thread_count(threads["inference"], "inference", 1)
+        except ValueError as e:
+            warnings.append(str(e))
+
+    opencv_threads = None
+    if threads.get("opencv") is not None:
+        try:
+            opencv_threads = _parse_thread_count(threads["opencv"], "opencv", 0)
+        except ValueError as e:
+            warnings.append(str(e))
+
+    affinity = None
+    if config.get("affinity") is not None:
+        try:
+            affinity = _parse_cpu_list(config["affinity"])
+        except (TypeError, ValueError):
+            warnings.append(f"invalid affinity {config['affinity']!r}")
+
+    # Core affinity (Linux only); without an affinity the start-up mask is restored
+    effective_inference = None
+    if hasattr(os, "sched_setaffinity"):
+        try:
+            if affinity is not None:
+                cores = sorted(affinity & _INITIAL_AFFINITY)
+                if not cores:
+                    raise ValueError(f"no usable cores in {sorted(affinity)}")
+                if inference_threads is not None:
+                    cores = cores[:inference_threads]
+                    effective_inference = len(cores)
+            else:
+                cores = sorted(_INITIAL_AFFINITY)
+                if inference_threads is not None:
+                    warnings.append("threads.inference is only enforced together with affinity")
+            _set_process_affinity(set(cores))
+        except (OSError, ValueError) as e:
+            warnings.append(f"affinity not applied: {str(e)}")
+    elif affinity is not None:
+        warnings.append("affinity not supported on this platform")
+
+    # OpenCV worker threads (0 disables the OpenCV thread pool); like the
+    # affinity, a config without the key goes back to the start-up value
+    cv2.setNumThreads(opencv_threads if opencv_threads is not None else _INITIAL_OPENCV_THREADS)
+
+    effective_affinity = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else None
+
+    effective = {
+        "opencv": cv2.getNumThreads(),
+        "inference": effective_inference,
+        "affinity": effective_affinity,
+    }
+    if warnings:
+        effective["warnings"] = warnings
+
+    return effective
+
+
+# ---------------------------------------------------------------------------
+# stdin framing
+#
+# v1: [u32 header_length][JSON header][payload (data_length bytes)]
+# v2: [fixed header][u32 header_crc][JSON ext (ext_length)][payload]
+#     fixed header = magic, version, type, flags, seq, ext_length,
+#     payload_length, payload_crc (crc32 of ext + payload) and
+#     crop/ROI boxes as doubles so process_frame needs no JSON;
+#     path frames carry [u64 size][f64 mtime][UTF-8 path] as payload
+# ---------------------------------------------------------------------------
+
+PROTOCOL_MAGIC = b"CMF2"
+PROTOCOL_VERSION = 2
+
+FRAME_TYPE_PROCESS = 1  # Binary image payload, crop/ROI in fixed fields
+FRAME_TYPE_COMMAND = 2  # JSON command in ext, no payload
+FRAME_TYPE_PATH = 3     # Frame file path: path fields + UTF-8 path as payload
+
+FRAME_FLAG_CROP = 0x1
+FRAME_FLAG_ROI = 0x2
+FRAME_FLAG_LATEST = 0x4    # Path frame: path is a directory, take its newest frame
+FRAME_FLAG_EXPECTED = 0x8  # Path frame: expected size/mtime are set
+
+FRAME_HEADER = struct.Struct("<4sBBHIIII12d")
+FRAME_HEADER_CRC = struct.Struct("<I")
+FRAME_HEADER_SIZE = FRAME_HEADER.size + FRAME_HEADER_CRC.size
+
+# Leads the payload of a path frame: expected size, expected mtime (ms)
+FRAME_PATH_FIELDS = struct.Struct("<Qd")
+
+# A v1 header is a small JSON object; anything larger is treated as corruption
+MAX_V1_HEADER_LENGTH = 64 * 1024
+
+READ_CHUNK_SIZE = 64 * 1024
+
+
+class FrameError(Exception):
+    """Recoverable framing error, reported to Node and then skipped"""
+
+    def __init__(self, message, seq=None):
+        super().__init__(message)
+        self.seq = seq
+
+
+def write_response(response, seq=None):
+    """
+    Write one JSON result line to stdout
+    seq is echoed back for v2 frames so Node can match responses
+    """
+    if seq is not None:
+        response["seq"] = seq
+    print(json.dumps(response), flush=True)
+
+
+def _box_from_fields(values):
+    return {"x1": values[0], "y1": values[1], "x2": values[2], "y2": values[3]}
+
+
+class FrameReader:
+    """
+    Reads v1 and v2 framed messages from a binary stream
+
+    Starts in v1 mode; a "hello" command switches to v2 via negotiate().
+    In v2 mode any corruption (bad header checksum, unknown version,
+    unparsable v1 header) drops sync and the next read skips ahead to
+    the next magic word instead of misreading image bytes as lengths.
+    A payload checksum mismatch hands back any magic word found inside
+    the consumed payload, so a truncated frame costs only that frame.
+    """
+
+    def __init__(self, stream=None):
+        self.stream = stream if stream is not None else sys.stdin.buffer
+        self.buffer = bytearray()
+        self.protocol = 1
+        self.synced = True
+        self.resync_count = 0
+        self.skipped_bytes = 0
+
+    def negotiate(self, versions):
+        """
+        Pick the highest protocol version both sides support
+        """
+        if isinstance(versions, int):
+            versions = [versions]
+        supported = [v for v in (versions or []) if v in (1, PROTOCOL_VERSION)]
+        self.protocol = max(supported) if supported else 1
+        return self.protocol
+
+    def get_stats(self):
+        return {
+            "protocol": self.protocol,
+            "resyncs": self.resync_count,
+            "skipped_bytes": self.skipped_bytes,
+        }
+
+    def read_message(self):
+        """
+        Read the next message
+
+        Returns:
+            (header dict, payload bytearray or None), or None on EOF
+        Raises:
+            FrameError for a corrupted message that was skipped
+        """
+        if not self.synced:
+            if not self._resync():
+                return None
+
+        if not self._fill(4):
+            return None
+
+        if self.buffer[:4] == PROTOCOL_MAGIC:
+            return self._read_v2()
+
+        return self._read_v1()
+
+    def _fill(self, size):
+        """Buffer at least size bytes, False on EOF"""
+        while len(self.buffer) < size:
+            chunk = self.stream.read1(max(size - len(self.buffer), READ_CHUNK_SIZE))
+            if not chunk:
+                return False
+            self.buffer += chunk
+        return True
+
+    def _take(self, size):
+        data = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        return data
+
+    def _read_exact(self, size):
+        """
+        Read size bytes into a fresh buffer, using what is already
+        buffered first and reading the rest straight from the stream
+        """
+        data = bytearray(size)
+        view = memoryview(data)
+        have = min(size, len(self.buffer))
+        view[:have] = self.buffer[:have]
+        del self.buffer[:have]
+
+        while have < size:
+            count = self.stream.readinto(view[have:])
+            if not count:
+                return None
+            have += count
+
+        return data
+
+    def _lose_sync(self, message, seq=None):
+        # Step past the current byte so the scan finds the *next* magic word
+        del self.buffer[:1]
+        self.skipped_bytes += 1
+        self.synced = False
+        raise FrameError(message, seq)
+
+    def _resync(self):
+        """Drop bytes up to the next magic word, False on EOF"""
+        keep = len(PROTOCOL_MAGIC) - 1
+        while True:
+            index = self.buffer.find(PROTOCOL_MAGIC)
+            if index >= 0:
+                del self.buffer[:index]
+                self.skipped_bytes += index
+                self.resync_count += 1
+                self.synced = True
+                return True
+
+            # Keep a partial magic word that may continue in the next chunk
+            drop = max(0, len(self.buffer) - keep)
+            del self.buffer[:drop]
+            self.skipped_bytes += drop
+
+            chunk = self.stream.read1(READ_CHUNK_SIZE)
+            if not chunk:
+                return False
+            self.buffer += chunk
+
+    def _read_v1(self):
+        header_length = int.from_bytes(self.buffer[:4], "little")
+        if header_length > MAX_V1_HEADER_LENGTH:
+            if self.protocol >= 2:
+                self._lose_sync(f"Invalid header length: {header_length}")
+            # v1 has no magic word to resync on; drop what is buffered
+            # instead of trying to read gigabytes of "header"
+            self.skipped_bytes += len(self.buffer)
+            self.buffer.clear()
+            raise FrameError(f"Invalid header length: {header_length}")
+
+        del self.buffer[:4]
+        if not self._fill(header_length):
+            return None
+        header_bytes = self._take(header_length)
+
+        try:
+            header = json.loads(header_bytes.decode("utf-8"))
+        except (UnicodeDecodeError, json.JSONDecodeError) as e:
+            if self.protocol >= 2:
+                self.synced = False
+            raise FrameError(f"Invalid header JSON: {str(e)}")
+
+        payload = None
+        if header.get("type") == "process_frame" and header.get("format") == "binary":
+            payload = self._read_exact(header.get("data_length", 0))
+            if payload is None:
+                return None
+
+        return header, payload
+
+    def _read_v2(self):
+        if not self._fill(FRAME_HEADER_SIZE):
+            return None
+
+        fields = FRAME_HEADER.unpack_from(self.buffer, 0)
+        (header_crc,) = FRAME_HEADER_CRC.unpack_from(self.buffer, FRAME_HEADER.size)
+        _, version, frame_type, flags, seq, ext_length, payload_length, payload_crc = fields[:8]
+
+        if zlib.crc32(self.buffer[:FRAME_HEADER.size]) != header_crc:
+            self._lose_sync("Frame header checksum mismatch")
+        if version != PROTOCOL_VERSION:
+            self._lose_sync(f"Unsupported frame version: {version}", seq)
+
+        del self.buffer[:FRAME_HEADER_SIZE]
+
+        ext = self._read_exact(ext_length)
+        payload = self._read_exact(payload_length)
+        if ext is None or payload is None:
+            return None
+
+        # Lengths were covered by the header checksum, but a truncated
+        # payload swallows the start of the next frame: hand everything
+        # from the first magic word back to the buffer
+        if zlib.crc32(payload, zlib.crc32(ext)) != payload_crc:
+            consumed = ext + payload
+            index = consumed.find(PROTOCOL_MAGIC)
+            if index >= 0:
+                self.buffer[:0] = consumed[index:]
+                self.skipped_bytes += index
+                self.resync_count += 1
+            raise FrameError("Payload checksum mismatch", seq)
+
+        try:
+            extra = json.loads(ext.decode("utf-8")) if ext_length else {}
+        except (UnicodeDecodeError, json.JSONDecodeError) as e:
+            raise FrameError(f"Invalid header JSON: {str(e)}", seq)
+
+        if frame_type in (FRAME_TYPE_PROCESS, FRAME_TYPE_PATH):
+            boxes = fields[8:]
+            if frame_type == FRAME_TYPE_PROCESS:
+                header = {
+                    "type": "process_frame",
+                    "format": "binary",
+                    "data_length": payload_length,
+                }
+            else:
+                header = self._path_header(payload, flags, seq)
+                payload = None
+            header["crop_info"] = None
+            header["roi_info"] = None
+            if flags & FRAME_FLAG_CROP:
+                header["crop_info"] = {
+                    "offsetX": boxes[0],
+                    "offsetY": boxes[1],
+                    "scaleX": boxes[2],
+                    "scaleY": boxes[3],
+                }
+            if flags & FRAME_FLAG_ROI:
+                start_roi = _box_from_fields(boxes[4:8])
+                stop_roi = _box_from_fields(boxes[8:12])
+                header["roi_info"] = {
+                    "start_roi": start_roi,
+                    "stop_roi": stop_roi,
+                    "bbox": {
+                        "x1": min(start_roi["x1"], stop_roi["x1"]),
+                        "y1": min(start_roi["y1"], stop_roi["y1"]),
+                        "x2": max(start_roi["x2"], stop_roi["x2"]),
+                        "y2": max(start_roi["y2"], stop_roi["y2"]),
+                    },
+                }
+            header.update(extra)
+        elif frame_type == FRAME_TYPE_COMMAND:
+            header = extra
+            payload = None
+        else:
+            raise FrameError(f"Unknown frame type: {frame_type}", seq)
+
+        header["seq"] = seq
+        return header, payload
+
+    @staticmethod
+    def _path_header(payload, flags, seq):
+        """Build the process_frame header of a path frame"""
+        if len(payload) < FRAME_PATH_FIELDS.size:
+            raise FrameError("Path frame too short", seq)
+        expected_size, expected_mtime = FRAME_PATH_FIELDS.unpack_from(payload, 0)
+        try:
+            path = payload[FRAME_PATH_FIELDS.size:].decode("utf-8")
+        except UnicodeDecodeError as e:
+            raise FrameError(f"Invalid frame path: {str(e)}", seq)
+
+        header = {
+            "type": "process_frame",
+            "format": "path",
+            "path": path,
+            "latest": bool(flags & FRAME_FLAG_LATEST),
+        }
+        if flags & FRAME_FLAG_EXPECTED:
+            header["expected_size"] = expected_size
+            header["expected_mtime"] = expected_mtime
+        return header
+
+
+# ---------------------------------------------------------------------------
+# Path-based frame input
+#
+# Node sends only the capture file path; the worker reads the file itself
+# into a reused buffer and decodes from it, so no image bytes cross the pipe
+# ---------------------------------------------------------------------------
+
+DEFAULT_FRAME_PATTERN = r"^frame\d+\.jpg$"
+
+# inotify event masks (linux/inotify.h)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+INOTIFY_EVENT = struct.Struct("iIII")
+
+
+class DirectoryWatcher:
+    """
+    Tracks the newest completed frame file in a capture directory
+
+    Uses inotify (close-after-write and rename-into-place events) where
+    available, otherwise falls back to scanning the directory by mtime.
+    """
+
+    def __init__(self, directory, pattern=DEFAULT_FRAME_PATTERN):
+        self.directory = directory
+        self.pattern = re.compile(pattern, re.IGNORECASE)
+        self.fd = None
+        self.latest = self._scan()
+
+        try:
+            libc = ctypes.CDLL(None, use_errno=True)
+            fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+            if fd < 0:
+                raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+            if libc.inotify_add_watch(fd, os.fsencode(directory), IN_CLOSE_WRITE | IN_MOVED_TO) < 0:
+                os.close(fd)
+                raise OSError(ctypes.get_errno(), "inotify_add_watch failed")
+            self.fd = fd
+        except (OSError, AttributeError):
+            # No inotify (non-Linux), poll() scans the directory instead
+            self.fd = None
+
+    def _scan(self):
+        newest = None
+        newest_mtime = -1
+        try:
+            with os.scandir(self.directory) as entries:
+                for entry in entries:
+                    if not self.pattern.match(entry.name):
+                        continue
+                    mtime = entry.stat().st_mtime_ns
+                    if mtime > newest_mtime:
+                        newest, newest_mtime = entry.path, mtime
+        except OSError:
+            return None
+        return newest
+
+    def poll(self):
+        """Return the path of the newest completed frame, or None"""
+        if self.fd is None:
+            self.latest = self._scan()
+            return self.latest
+
+        # Drain pending events; the last matching name is the newest frame
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            if not data:
+                break
+
+            offset = 0
+            while offset + INOTIFY_EVENT.size <= len(data):
+                _, _, _, name_length = INOTIFY_EVENT.unpack_from(data, offset)
+                offset += INOTIFY_EVENT.size
+                name = data[offset:offset + name_length].rstrip(b"\0").decode("utf-8", "replace")
+                offset += name_length
+                if self.pattern.match(name):
+                    self.latest = os.path.join(self.directory, name)
+
+        return self.latest
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+
+class FrameFileReader:
+    """
+    Reads capture frame files into a reused buffer
+
+    Files are read with os.readv instead of mmap: the capture process
+    replaces frames while we read, and a truncated mapping raises SIGBUS.
+    """
+
+    def __init__(self):
+        self.buffer = bytearray(1024 * 1024)
+        self.watchers = {}
+        self.last_latest = None
+
+    def read(self, path, expected_size=None, expected_mtime=None):
+        """
+        Read a frame file
+
+        Args:
+            path: Frame file path
+            expected_size: Optional size seen by Node, a mismatch means the
+                           file was replaced or is still being written
+            expected_mtime: Optional mtime in ms seen by Node, an older file
+                            means a stale frame
+
+        Returns:
+            numpy uint8 view on the internal buffer (valid until the next read)
+        """
+        if not isinstance(path, str) or not path:
+            raise FrameError(f"Invalid frame path: {path!r}")
+        for name, value in (("expected_size", expected_size), ("expected_mtime", expected_mtime)):
+            if value is not None and (isinstance(value, bool) or not isinstance(value, (int, float))):
+                raise FrameError(f"Invalid {name}: {value!r}")
+
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except (OSError, ValueError) as e:
+            raise FrameError(f"Failed to open frame file: {str(e)}")
+
+        try:
+            stat = os.fstat(fd)
+            size = stat.st_size
+
+            if size == 0:
+                raise FrameError("Empty image data")
+            if expected_size is not None and size != expected_size:
+                raise FrameError(f"Frame file size mismatch: {size} != {expected_size}")
+            if expected_mtime is not None and stat.st_mtime_ns / 1e6 < expected_mtime - 1:
+                raise FrameError("Stale frame file")
+
+            if len(self.buffer) < size:
+                self.buffer = bytearray(size + size // 4)
+
+            view = memoryview(self.buffer)
+            have = 0
+            while have < size:
+                if hasattr(os, "readv"):
+                    count = os.readv(fd, [view[have:size]])
+                else:
+                    chunk = os.read(fd, size - have)
+                    view[have:have + len(chunk)] = chunk
+                    count = len(chunk)
+                if not count:
+                    break
+                have += count
+        finally:
+            os.close(fd)
+
+        if have < size:
+            raise FrameError("Incomplete frame file")
+
+        # Capture renames finished frames into place, so there is no need to
+        # check for a JPEG EOI marker here - cv2.imdecode rejects broken data
+        return np.frombuffer(self.buffer, np.uint8, count=size)
+
+    def read_latest(self, directory, pattern=DEFAULT_FRAME_PATTERN):
+        """
+        Read the newest completed frame in a watched capture directory
+
+        Returns:
+            numpy uint8 view, or None if there is no frame newer than the last one
+        """
+        if not isinstance(directory, str) or not directory:
+            raise FrameError(f"Invalid frame directory: {directory!r}")
+        if not isinstance(pattern, str):
+            raise FrameError(f"Invalid frame pattern: {pattern!r}")
+
+        watcher = self.watchers.get(directory)
+        if watcher is None:
+            try:
+                watcher = self.watchers[directory] = DirectoryWatcher(directory, pattern)
+            except re.error as e:
+                raise FrameError(f"Invalid frame pattern: {str(e)}")
+
+        path = watcher.poll()
+        if path is None:
+            raise FrameError(f"No frame files in {directory}")
+
+        # Same file name can be rewritten in place (live.jpg), compare mtime too
+        try:
+            key = (path, os.stat(path).st_mtime_ns)
+        except OSError as e:
+            raise FrameError(f"Failed to stat frame file: {str(e)}")
+        if key == self.last_latest:
+            return None
+        self.last_latest = key
+
+        return self.read(path)
+
+
+def load_frame(header, payload, frame_files):
+    """
+    Decode the image of a process_frame message
+
+    Args:
+        header: Message header ("format" is "binary" or "path")
+        payload: Image bytes for binary frames
+        frame_files: FrameFileReader used for path-based frames
+
+    Returns:
+        BGR image, or None if a "latest" request found no new frame
+
+    Raises:
+        FrameError: If the frame cannot be read or decoded
+    """
+    if header.get("format") == "path":
+        # Read the capture file ourselves instead of receiving it over the pipe
+        if header.get("latest"):
+            np_array = frame_files.read_latest(
+                header.get("path"), header.get("pattern", DEFAULT_FRAME_PATTERN)
+            )
+            if np_array is None:
+                return None
+        else:
+            np_array = frame_files.read(
+                header.get("path"), header.get("expected_size"), header.get("expected_mtime")
+            )
+    else:
+        # Convert bytes to numpy array
+        np_array = np.frombuffer(payload or b"", np.uint8)
+
+    if np_array.size == 0:
+        raise FrameError("Empty image data")
+
+    image = cv2.imdecode(np_array, cv2.IMREAD_COLOR)
+    if image is None:
+        raise FrameError("Failed to decode image")
+    return image
@@ -12,6 +12,15 @@ import numpy as np
 from io import BytesIO
 import base64
 
+from detector_common import (
+    FrameError,
+    FrameFileReader,
+    FrameReader,
+    apply_thread_config,
+    load_frame,
+    write_response
+)
+
 try:
     import mediapipe as mp
 except ImportError:
@@ -24,7 +33,8 @@ class HandDetector:
             config = {
                 "max_num_hands": 2,
                 "min_detection_confidence": 0.5,
-                "min_tracking_confidence": 0.5
+                "min_tracking_confidence": 0.5,
+                "pose_guided": False
             }
         
         self.mp_hands = mp.solutions.hands
@@ -36,6 +46,44 @@ class HandDetector:
         )
         
         self.mp_drawing = mp.solutions.drawing_utils
+
+        # Pose-guided search: pose wrist/elbow/index landmarks define small
+        # per-side hand crops, whole-frame palm detection only without a pose
+        self.pose_guided = config.get("pose_guided", False)
+        self.max_num_hands = config.get("max_num_hands", 2)
+        self.pose = None
+        self.crop_hands = {}
+        if self.pose_guided:
+            self.mp_pose = mp.solutions.pose
+            self.pose = self.mp_pose.Pose(
+                static_image_mode=False,
+                model_complexity=0,  # Lite model, only wrists/elbows/index are needed
+                smooth_landmarks=True,
+                min_detection_confidence=config.get("min_detection_confidence", 0.5),
+                min_tracking_confidence=config.get("min_tracking_confidence", 0.5)
+            )
+
+            # One single-hand tracker per arm so tracking survives between crops
+            for side in ("left", "right"):
+                self.crop_hands[side] = self.mp_hands.Hands(
+                    static_image_mode=False,
+                    max_num_hands=1,
+                    min_detection_confidence=config.get("min_detection_confidence", 0.5),
+                    min_tracking_confidence=config.get("min_tracking_confidence", 0.5)
+                )
+
+            self.arm_landmarks = {
+                "left": (
+                    self.mp_pose.PoseLandmark.LEFT_WRIST,
+                    self.mp_pose.PoseLandmark.LEFT_ELBOW,
+                    self.mp_pose.PoseLandmark.LEFT_INDEX
+                ),
+                "right": (
+                    self.mp_pose.PoseLandmark.RIGHT_WRIST,
+                    self.mp_pose.PoseLandmark.RIGHT_ELBOW,
+                    self.mp_pose.PoseLandmark.RIGHT_INDEX
+                )
+            }
     
     def detect_gesture(self, hand_landmarks):
         """
@@ -82,6 +130,157 @@ class HandDetector:
         else:
             return "unknown"
     
+    def extract_hand_info(self, hand_landmarks, handedness, crop_box=None):
+        """
+        Build the result dict for one detected hand
+        
+        Args:
+            hand_landmarks: MediaPipe hand landmarks
+            handedness: MediaPipe handedness classification
+            crop_box: Optional (x1, y1, x2, y2, width, height) in pixels when the
+                      landmarks were found on a sub-crop; mapped back to the frame
+        """
+        # Get handedness (Left/Right)
+        hand_label = handedness.classification[0].label
+        hand_confidence = handedness.classification[0].score
+        
+        if crop_box:
+            x1, y1, x2, y2, width, height = crop_box
+            scale_x = (x2 - x1) / width
+            scale_y = (y2 - y1) / height
+            offset_x = x1 / width
+            offset_y = y1 / height
+        else:
+            scale_x = scale_y = 1.0
+            offset_x = offset_y = 0.0
+        
+        # Get bounding box
+        landmarks = []
+        x_coords = []
+        y_coords = []
+        
+        for landmark in hand_landmarks.landmark:
+            # Map crop-local landmarks back to the processed image (identity without crop_box)
+            # In crop_mode the processed image is the camera crop, so ROI boundaries work correctly
+            x = offset_x + landmark.x * scale_x
+            y = offset_y + landmark.y * scale_y
+            
+            landmarks.append({"x": x, "y": y, "z": landmark.z * scale_x})
+            x_coords.append(x)
+            y_coords.append(y)
+        
+        # Calculate bounding box (normalized coordinates)
+        bbox = {
+            "x1": min(x_coords),
+            "y1": min(y_coords), 
+            "x2": max(x_coords),
+            "y2": max(y_coords)
+        }
+        
+        # Calculate center point
+        center = {
+            "x": (bbox["x1"] + bbox["x2"]) / 2,
+            "y": (bbox["y1"] + bbox["y2"]) / 2
+        }
+        
+        # Detect gesture (open palm) - crop mapping is scale + offset only,
+        # so the relative landmark tests work on the crop coordinates
+        gesture = self.detect_gesture(hand_landmarks)
+        
+        return {
+            "handedness": hand_label,  # "Left" or "Right" 
+            "confidence": hand_confidence,
+            "bbox": bbox,
+            "center": center,
+            "landmarks": landmarks,
+            "gesture": gesture
+        }
+    
+    def get_hand_crop(self, pose_landmarks, side, width, height):
+        """
+        Estimate a square hand crop from pose wrist, elbow and index landmarks
+        Returns (x1, y1, x2, y2) in pixels, or None if the wrist is not visible
+        """
+        wrist_id, elbow_id, index_id = self.arm_landmarks[side]
+        wrist = pose_landmarks.landmark[wrist_id]
+        elbow = pose_landmarks.landmark[elbow_id]
+        index = pose_landmarks.landmark[index_id]
+        
+        if wrist.visibility < 0.5:
+            return None
+        
+        wrist_xy = np.array([wrist.x * width, wrist.y * height])
+        elbow_xy = np.array([elbow.x * width, elbow.y * height])
+        index_xy = np.array([index.x * width, index.y * height])
+        
+        forearm = wrist_xy - elbow_xy
+        forearm_length = np.linalg.norm(forearm)
+        hand_vector = index_xy - wrist_xy
+        
+        # Hand size from wrist->index, forearm length as a lower bound
+        # for foreshortened or poorly localized index landmarks
+        hand_size = max(np.linalg.norm(hand_vector) * 2.0, forearm_length * 0.7)
+        
+        # Hand center sits past the wrist, along wrist->index (or the forearm)
+        if index.visibility >= 0.5:
+            center = wrist_xy + hand_vector * 0.5
+        elif forearm_length > 0:
+            center = wrist_xy + forearm / forearm_length * hand_size * 0.5
+        else:
+            center = wrist_xy
+        
+        # Palm detector works best with the hand filling about half the input
+        half = hand_size
+        x1 = int(max(0, center[0] - half))
+        y1 = int(max(0, center[1] - half))
+        x2 = int(min(width, center[0] + half))
+        y2 = int(min(height, center[1] + half))
+        
+        if x2 - x1 < 16 or y2 - y1 < 16:
+            return None
+        
+        return x1, y1, x2, y2
+    
+    def detect_pose_guided(self, rgb_image):
+        """
+        Run hand landmarking on pose-derived hand crops
+        Returns a list of hand info dicts, or None when no pose is available
+        (caller then falls back to whole-frame palm detection)
+        """
+        height, width = rgb_image.shape[:2]
+        
+        pose_results = self.pose.process(rgb_image)
+        if not pose_results.pose_landmarks:
+            return None
+        
+        hands_info = []
+        for side, hands in self.crop_hands.items():
+            crop = self.get_hand_crop(pose_results.pose_landmarks, side, width, height)
+            if crop is None:
+                continue
+            
+            x1, y1, x2, y2 = crop
+            crop_image = np.ascontiguousarray(rgb_image[y1:y2, x1:x2])
+            results = hands.process(crop_image)
+            
+            if results.multi_hand_landmarks and results.multi_handedness:
+                hands_info.append(self.extract_hand_info(
+                    results.multi_hand_landmarks[0],
+                    results.multi_handedness[0],
+                    crop_box=(x1, y1, x2, y2, width, height)
+                ))
+        
+        # Overlapping crops (hands close together) can find the same hand twice
+        if len(hands_info) == 2:
+            first, second = hands_info
+            distance = np.hypot(first["center"]["x"] - second["center"]["x"],
+                                first["center"]["y"] - second["center"]["y"])
+            if distance < 0.05:
+                hands_info = [max(hands_info, key=lambda hand: hand["confidence"])]
+        
+        hands_info.sort(key=lambda hand: hand["confidence"], reverse=True)
+        return hands_info[:self.max_num_hands]
+    
     def process_frame(self, image_data, format='base64', crop_info=None, roi_info=None):
         """
         Process a single frame and detect hands
@@ -144,6 +343,17 @@ class HandDetector:
             # Convert BGR to RGB (MediaPipe uses RGB)
             rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
             
+            # Pose-guided search first, whole frame only when no pose is found
+            if self.pose_guided:
+                hands_info = self.detect_pose_guided(rgb_image)
+                if hands_info is not None:
+                    return {
+                        "success": True,
+                        "hands": hands_info,
+                        "search": "pose_guided",
+                        "timestamp": time.time()
+                    }
+            
             # Process the image
             results = self.hands.process(rgb_image)
             
@@ -152,55 +362,12 @@ class HandDetector:
             
             if results.multi_hand_landmarks and results.multi_handedness:
                 for hand_landmarks, handedness in zip(results.multi_hand_landmarks, results.multi_handedness):
-                    # Get handedness (Left/Right)
-                    hand_label = handedness.classification[0].label
-                    hand_confidence = handedness.classification[0].score
-                    
-                    # Get bounding box
-                    landmarks = []
-                    x_coords = []
-                    y_coords = []
-                    
-                    for landmark in hand_landmarks.landmark:
-                        x, y = landmark.x, landmark.y
-                        
-                        # In crop_mode, treat the cropped image as the full image
-                        # No coordinate transformation needed - just use normalized coordinates as-is
-                        # This way ROI boundaries work correctly
-                        
-                        landmarks.append({"x": x, "y": y, "z": landmark.z})
-                        x_coords.append(x)
-                        y_coords.append(y)
-                    
-                    # Calculate bounding box (normalized coordinates)
-                    bbox = {
-                        "x1": min(x_coords),
-                        "y1": min(y_coords), 
-                        "x2": max(x_coords),
-                        "y2": max(y_coords)
-                    }
-                    
-                    # Calculate center point
-                    center = {
-                        "x": (bbox["x1"] + bbox["x2"]) / 2,
-                        "y": (bbox["y1"] + bbox["y2"]) / 2
-                    }
-                    
-                    # Detect gesture (open palm)
-                    gesture = self.detect_gesture(hand_landmarks)
-                    
-                    hands_info.append({
-                        "handedness": hand_label,  # "Left" or "Right" 
-                        "confidence": hand_confidence,
-                        "bbox": bbox,
-                        "center": center,
-                        "landmarks": landmarks,
-                        "gesture": gesture
-                    })
+                    hands_info.append(self.extract_hand_info(hand_landmarks, handedness))
             
             return {
                 "success": True,
                 "hands": hands_info,
+                "search": "full_frame",
                 "timestamp": time.time()
             }
             
@@ -214,77 +381,67 @@ class HandDetector:
 def main():
     """
     Main loop for processing stdin input
-    Expected input: Binary protocol with header
+    Expected input: Binary protocol with header (v1, or v2 after "hello")
     """
     detector = HandDetector()
-    
+    reader = FrameReader(sys.stdin.buffer)
+    frame_files = FrameFileReader()
+
     try:
         while True:
-            # Read header length (4 bytes)
-            header_length_bytes = sys.stdin.buffer.read(4)
-            if not header_length_bytes or len(header_length_bytes) < 4:
-                break
-                
-            # Parse header length
-            header_length = int.from_bytes(header_length_bytes, 'little')
-            
-            # Read header
-            header_bytes = sys.stdin.buffer.read(header_length)
-            if not header_bytes or len(header_bytes) < header_length:
-                break
-                
-            # Parse header JSON
             try:
-                header = json.loads(header_bytes.decode('utf-8'))
-            except json.JSONDecodeError as e:
-                print(json.dumps({"error": f"Invalid header JSON: {str(e)}"}), flush=True)
+                message = reader.read_message()
+            except FrameError as e:
+                write_response({"error": str(e)}, e.seq)
                 continue
-                
+
+            if message is None:
+                break
+
+            header, image_bytes = message
+            seq = header.get("seq")
+
             if header.get("type") == "process_frame":
-                if header.get("format") == "binary":
-                    # Read binary image data
-                    data_length = header.get("data_length", 0)
-                    image_bytes = sys.stdin.buffer.read(data_length)
-                    
-                    if len(image_bytes) < data_length:
-                        print(json.dumps({"error": "Incomplete image data"}), flush=True)
-                        continue
-                    
-                    # Process binary data directly
+                if header.get("format") in ("binary", "path"):
+                    # Process binary or path-based frame
                     crop_info = header.get("crop_info", None)
                     roi_info = header.get("roi_info", None)
-                    
-                    # Convert bytes to numpy array
-                    np_array = np.frombuffer(image_bytes, np.uint8)
-                    if np_array.size == 0:
-                        print(json.dumps({"error": "Empty image data"}), flush=True)
+
+                    try:
+                        image = load_frame(header, image_bytes, frame_files)
+                    except FrameError as e:
+                        write_response({"error": str(e)}, seq)
                         continue
-                    
-                    # Decode image
-                    image = cv2.imdecode(np_array, cv2.IMREAD_COLOR)
                     if image is None:
-                        print(json.dumps({"error": "Failed to decode image"}), flush=True)
+                        write_response({"success": True, "skipped": True, "message": "no new frame"}, seq)
                         continue
-                    
+
                     # Process with both crop and roi info
                     result = detector.process_frame(image, format='numpy', crop_info=crop_info, roi_info=roi_info)
-                    
+
                     # Output result
-                    print(json.dumps(result), flush=True)
-                    
+                    write_response(result, seq)
+
+            elif header.get("type") == "hello":
+                # Protocol negotiation
+                protocol = reader.negotiate(header.get("protocol", [1]))
+                write_response({"success": True, "message": "hello", "protocol": protocol}, seq)
+
             elif header.get("type") == "ping":
                 # Health check
-                print(json.dumps({"success": True, "message": "pong"}), flush=True)
-                
+                write_response({"success": True, "message": "pong", **reader.get_stats()}, seq)
+
             elif header.get("type") == "config":
                 # Update configuration
                 new_config = header.get("config", {})
+                # Thread budget/affinity first so the new graph inherits it
+                thread_settings = apply_thread_config(new_config)
                 detector = HandDetector(new_config)
-                print(json.dumps({"success": True, "message": "config updated"}), flush=True)
-                
+                write_response({"success": True, "message": "config updated", "threads": thread_settings}, seq)
+
             else:
-                print(json.dumps({"error": f"Unknown command type: {header.get('type')}"}), flush=True)
-                
+                write_response({"error": f"Unknown command type: {header.get('type')}"}, seq)
+
     except KeyboardInterrupt:
         pass
     except Exception as e:
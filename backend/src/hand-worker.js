@@ -3,6 +3,7 @@ const { spawn } = require('child_process');
 const { EventEmitter } = require('events');
 const path = require('path');
 const fs = require('fs');
+const { SUPPORTED_PROTOCOLS, encodeV1, encodeFrame, encodePathFrame, encodeCommand } = require('./worker-protocol');
 // const sharp = require('sharp'); // Removed - processing done in Python for better performance
 
 class HandWorker extends EventEmitter {
@@ -28,6 +29,9 @@ class HandWorker extends EventEmitter {
         this.adaptiveFpsEnabled = isARM; // Enable adaptive FPS on ARM
         this.cpuLoadThreshold = 0.8; // Reduce FPS if CPU > 80%
         this.lastCropInfo = null; // Store crop info for coordinate transformation
+        this.threadSettings = null; // Effective thread/affinity settings reported by Python
+        this.protocolVersion = 1; // stdin framing, upgraded to v2 after hello handshake
+        this.frameSeq = 0;
     }
 
     async start() {
@@ -38,10 +42,12 @@ class HandWorker extends EventEmitter {
 
         try {
             await this.checkPythonDependencies();
-            this.startPythonProcess();
+            // Mark running first so the initial config command in startPythonProcess is sent
             this.isRunning = true;
+            this.startPythonProcess();
             console.log('[HandWorker] Started successfully');
         } catch (error) {
+            this.isRunning = false;
             console.error('[HandWorker] Failed to start:', error);
             throw error;
         }
@@ -90,6 +96,8 @@ class HandWorker extends EventEmitter {
         this.process = spawn(pythonCmd, [scriptPath], {
             stdio: ['pipe', 'pipe', 'pipe'],
         });
+        this.protocolVersion = 1;
+        this.frameSeq = 0;
 
         this.process.stdout.on('data', (data) => {
             const lines = data.toString().split('\n');
@@ -139,6 +147,11 @@ class HandWorker extends EventEmitter {
             }
         });
 
+        // Negotiate v2 framing (checksummed, resynchronizable) unless pinned to v1
+        if (this.config.protocol !== 1) {
+            this.sendCommand({ type: 'hello', protocol: SUPPORTED_PROTOCOLS });
+        }
+
         // Send initial configuration with model complexity
         this.sendCommand({
             type: 'config',
@@ -147,6 +160,9 @@ class HandWorker extends EventEmitter {
                 min_detection_confidence: this.config.min_detection_confidence,
                 min_tracking_confidence: this.config.min_tracking_confidence,
                 model_complexity: this.config.model_complexity || 1,
+                pose_guided: this.config.pose_guided || false,
+                threads: this.config.threads,
+                affinity: this.config.affinity,
             },
         });
     }
@@ -164,13 +180,9 @@ class HandWorker extends EventEmitter {
             }
 
             // Use binary protocol for all commands
-            const header = JSON.stringify(command);
-            const headerBuffer = Buffer.from(header);
-            const headerLength = Buffer.allocUnsafe(4);
-            headerLength.writeUInt32LE(headerBuffer.length, 0);
-
-            this.process.stdin.write(headerLength);
-            this.process.stdin.write(headerBuffer);
+            const buffers =
+                this.protocolVersion >= 2 ? encodeCommand(this.nextSeq(), command) : encodeV1(command);
+            this.writeBuffers(buffers);
             
             return true;
         } catch (error) {
@@ -179,6 +191,17 @@ class HandWorker extends EventEmitter {
         }
     }
 
+    nextSeq() {
+        this.frameSeq = (this.frameSeq + 1) >>> 0;
+        return this.frameSeq;
+    }
+
+    writeBuffers(buffers) {
+        for (const buffer of buffers) {
+            this.process.stdin.write(buffer);
+        }
+    }
+
     async processFrame(imageBuffer, cropMode = false, roiConfig = null) {
         if (!this.isRunning) {
             console.log('[HandWorker] Skipping frame - worker not running');
@@ -191,6 +214,12 @@ class HandWorker extends EventEmitter {
             return false;
         }
 
+        return this.submitFrame({ buffer: imageBuffer }, cropMode, roiConfig);
+    }
+
+    // frame: { buffer } for image bytes over the pipe, or { path, size, mtime, latest }
+    // to let the Python worker read the capture file itself
+    submitFrame(frame, cropMode = false, roiConfig = null) {
         // Rate limiting with adaptive FPS
         const now = Date.now();
         const currentInterval = this.adaptiveFpsEnabled ? this.getAdaptiveInterval() : this.frameInterval;
@@ -248,25 +277,44 @@ class HandWorker extends EventEmitter {
             this.lastCropInfo = cropInfo;
             this.lastRoiInfo = roiInfo;
 
-            // Send binary data length and both crop/roi info as JSON header
-            const header = JSON.stringify({
-                type: 'process_frame',
-                format: 'binary',
-                data_length: imageBuffer.length,
-                crop_info: cropInfo,
-                roi_info: roiInfo
-            });
+            let buffers;
+            if (frame.buffer) {
+                const imageBuffer = frame.buffer;
+                // v2: fixed binary header, v1: JSON header with data length
+                buffers =
+                    this.protocolVersion >= 2
+                        ? encodeFrame(this.nextSeq(), imageBuffer, cropInfo, roiInfo)
+                        : encodeV1(
+                              {
+                                  type: 'process_frame',
+                                  format: 'binary',
+                                  data_length: imageBuffer.length,
+                                  crop_info: cropInfo,
+                                  roi_info: roiInfo,
+                              },
+                              imageBuffer
+                          );
+            } else {
+                // Path only - no image bytes through the pipe
+                // v2: binary path frame, v1: JSON header with the path
+                buffers =
+                    this.protocolVersion >= 2
+                        ? encodePathFrame(this.nextSeq(), frame, cropInfo, roiInfo)
+                        : encodeV1({
+                              type: 'process_frame',
+                              format: 'path',
+                              path: frame.path,
+                              expected_size: frame.size,
+                              expected_mtime: frame.mtime,
+                              latest: frame.latest || false,
+                              crop_info: cropInfo,
+                              roi_info: roiInfo,
+                          });
+            }
 
-            // Send header length (4 bytes), header, then binary data
-            const headerBuffer = Buffer.from(header);
-            const headerLength = Buffer.allocUnsafe(4);
-            headerLength.writeUInt32LE(headerBuffer.length, 0);
-            
             // Write all data to Python process with error handling
             if (this.process && this.process.stdin && !this.process.stdin.destroyed) {
-                this.process.stdin.write(headerLength);
-                this.process.stdin.write(headerBuffer);
-                this.process.stdin.write(imageBuffer);
+                this.writeBuffers(buffers);
             } else {
                 console.log('[HandWorker] Process stdin is not available');
                 this.pendingFrames--;
@@ -286,6 +334,11 @@ class HandWorker extends EventEmitter {
             return false;
         }
 
+        // Let the Python worker read the capture file (no readFileSync + pipe copy)
+        if (this.config.path_input !== false) {
+            return this.processFramePath(imagePath, cropMode, roiConfig);
+        }
+
         try {
             const imageBuffer = fs.readFileSync(imagePath);
 
@@ -302,8 +355,72 @@ class HandWorker extends EventEmitter {
         }
     }
 
+    processFramePath(imagePath, cropMode = false, roiConfig = null) {
+        try {
+            // watch_latest: worker follows the capture directory and takes the newest frame
+            if (this.config.watch_latest) {
+                return this.submitFrame(
+                    { path: path.resolve(path.dirname(imagePath)), latest: true },
+                    cropMode,
+                    roiConfig
+                );
+            }
+
+            const stats = fs.statSync(imagePath);
+            if (stats.size === 0) {
+                console.log('[HandWorker] Skipping frame - empty image file:', imagePath);
+                return false;
+            }
+
+            return this.submitFrame(
+                { path: path.resolve(imagePath), size: stats.size, mtime: stats.mtimeMs },
+                cropMode, roiConfig
+            );
+        } catch (error) {
+            console.error('[HandWorker] Failed to stat image:', error);
+            return false;
+        }
+    }
+
+    // v2 responses echo seq: everything sent up to it has been answered, so the
+    // pending count is last sent - last acknowledged. This also covers frames
+    // skipped by a resync that never get their own response.
+    acknowledge(result) {
+        if (typeof result.seq === 'number') {
+            this.pendingFrames = Math.max(0, this.frameSeq - result.seq);
+            return true;
+        }
+
+        if (this.protocolVersion >= 2 && result.error) {
+            // Framing error without seq - outstanding frames may be lost,
+            // the next acknowledged response recounts them
+            this.pendingFrames = 0;
+            return true;
+        }
+
+        return false;
+    }
+
     handleResult(result) {
-        this.pendingFrames = Math.max(0, this.pendingFrames - 1);
+        const acknowledged = this.acknowledge(result);
+
+        // Control responses are not frame results
+        if (result.message === 'hello') {
+            this.protocolVersion = result.protocol || 1;
+            console.log(`[HandWorker] Using protocol v${this.protocolVersion}`);
+            return;
+        }
+
+        if (result.threads) {
+            this.threadSettings = result.threads;
+            console.log('[HandWorker] Thread settings:', JSON.stringify(result.threads));
+            return;
+        }
+
+        // v1: one response per frame
+        if (!acknowledged) {
+            this.pendingFrames = Math.max(0, this.pendingFrames - 1);
+        }
 
         if (result.error) {
             console.error('[HandWorker] Detection error:', result.error);
@@ -337,6 +454,9 @@ class HandWorker extends EventEmitter {
                 min_detection_confidence: this.config.min_detection_confidence,
                 min_tracking_confidence: this.config.min_tracking_confidence,
                 model_complexity: this.config.model_complexity || 1,
+                pose_guided: this.config.pose_guided || false,
+                threads: this.config.threads,
+                affinity: this.config.affinity,
             },
         });
     }
@@ -391,6 +511,8 @@ class HandWorker extends EventEmitter {
             lastProcessTime: this.lastProcessTime,
             frameSkipCounter: this.frameSkipCounter,
             adaptiveFpsEnabled: this.adaptiveFpsEnabled,
+            threadSettings: this.threadSettings,
+            protocolVersion: this.protocolVersion,
             currentFps: this.frameInterval > 0 ? Math.round(1000 / this.getAdaptiveInterval()) : 0,
         };
     }
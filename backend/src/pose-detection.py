@@ -12,19 +12,167 @@ import numpy as np
 from io import BytesIO
 import base64
 
+from detector_common import (
+    FrameError,
+    FrameFileReader,
+    FrameReader,
+    apply_thread_config,
+    load_frame,
+    write_response
+)
+
 try:
     import mediapipe as mp
 except ImportError:
     print(json.dumps({"error": "mediapipe not installed. Run: pip install mediapipe opencv-python"}))
     sys.exit(1)
 
+DEFAULT_HISTORY_SIZE = 64
+DEFAULT_FEATURE_WINDOW_MS = 1000
+
+
+def _valid_history_size(value):
+    return isinstance(value, int) and not isinstance(value, bool) and value >= 1
+
+
+def _valid_window_ms(value):
+    return (isinstance(value, (int, float)) and not isinstance(value, bool)
+            and np.isfinite(value) and value > 0)
+
+
+class PoseHistory:
+    """
+    Fixed-size ring buffer of recent pose landmarks and per-frame flags
+    All storage is preallocated; windowed queries are vectorized over the
+    frames inside the window
+    """
+    NUM_LANDMARKS = 33
+
+    # Landmark indices used by the aggregate features
+    LEFT_SHOULDER = 11
+    RIGHT_SHOULDER = 12
+    LEFT_HIP = 23
+    RIGHT_HIP = 24
+
+    def __init__(self, capacity=DEFAULT_HISTORY_SIZE):
+        if not _valid_history_size(capacity):
+            raise ValueError(f"history_size must be an integer >= 1, got {capacity!r}")
+        self.capacity = capacity
+        self.timestamps = np.zeros(capacity, dtype=np.float64)
+        self.landmarks = np.full((capacity, self.NUM_LANDMARKS, 4), np.nan, dtype=np.float32)  # x, y, z, visibility
+        self.detected = np.zeros(capacity, dtype=bool)
+        self.full_body_visible = np.zeros(capacity, dtype=bool)
+        self.should_stop = np.zeros(capacity, dtype=bool)
+        self.back_view = np.zeros(capacity, dtype=bool)
+        self.head = 0  # Next slot to write
+        self.count = 0
+
+    def push(self, timestamp, landmarks=None, full_body_visible=False, should_stop=False, back_view=False):
+        """
+        Record one frame
+        landmarks: MediaPipe pose landmarks, or None if no pose was detected
+        """
+        i = self.head
+        self.timestamps[i] = timestamp
+        self.detected[i] = landmarks is not None
+        self.full_body_visible[i] = full_body_visible
+        self.should_stop[i] = should_stop
+        self.back_view[i] = back_view
+
+        if landmarks is not None:
+            slot = self.landmarks[i]
+            for j, landmark in enumerate(landmarks.landmark):
+                slot[j] = (landmark.x, landmark.y, landmark.z, landmark.visibility)
+        else:
+            self.landmarks[i] = np.nan
+
+        self.head = (i + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def window_indices(self, window_ms, now):
+        """Ring indices of frames within the last window_ms, oldest first"""
+        start = now - window_ms / 1000.0
+        # Ring unrolled oldest first, so timestamps are sorted
+        order = (self.head - self.count + np.arange(self.count)) % self.capacity
+        first = np.searchsorted(self.timestamps[order], start, side="left")
+        return order[first:]
+
+    @staticmethod
+    def _slope(t, values):
+        """Least-squares slope of values over t (per second)"""
+        t_centered = t - t.mean()
+        denom = np.dot(t_centered, t_centered)
+        if denom <= 0:
+            return 0.0
+        return float(np.dot(t_centered, values - values.mean()) / denom)
+
+    def features(self, window_ms=DEFAULT_FEATURE_WINDOW_MS, now=None):
+        """
+        Aggregate features over the last window_ms
+
+        Returns:
+            dict with visibility ratios, torso rotation rate (deg/s) and
+            body-center velocity (normalized units/s)
+        """
+        if now is None:
+            now = time.monotonic()
+
+        idx = self.window_indices(window_ms, now)
+        n = len(idx)
+        features = {
+            "window_ms": window_ms,
+            "frames": n,
+            "detected_ratio": 0.0,
+            "full_body_ratio": 0.0,
+            "stop_ratio": 0.0,
+            "back_view_ratio": 0.0,
+            "torso_rotation_rate": 0.0,
+            "center_velocity": {"x": 0.0, "y": 0.0},
+            "center_speed": 0.0
+        }
+        if n == 0:
+            return features
+
+        features["detected_ratio"] = float(self.detected[idx].mean())
+        features["full_body_ratio"] = float(self.full_body_visible[idx].mean())
+        features["stop_ratio"] = float(self.should_stop[idx].mean())
+        features["back_view_ratio"] = float(self.back_view[idx].mean())
+
+        # Motion features only from frames with a pose
+        idx = idx[self.detected[idx]]
+        if len(idx) < 2:
+            return features
+
+        t = self.timestamps[idx]
+        frames = self.landmarks[idx]
+        left_shoulder = frames[:, self.LEFT_SHOULDER]
+        right_shoulder = frames[:, self.RIGHT_SHOULDER]
+
+        # Torso yaw from the shoulder line in the x/z plane
+        yaw = np.unwrap(np.arctan2(left_shoulder[:, 2] - right_shoulder[:, 2],
+                                   left_shoulder[:, 0] - right_shoulder[:, 0]))
+        features["torso_rotation_rate"] = float(np.degrees(self._slope(t, yaw)))
+
+        # Body center = mean of shoulders and hips
+        torso = frames[:, [self.LEFT_SHOULDER, self.RIGHT_SHOULDER, self.LEFT_HIP, self.RIGHT_HIP], :2]
+        center = torso.mean(axis=1)
+        velocity_x = self._slope(t, center[:, 0])
+        velocity_y = self._slope(t, center[:, 1])
+        features["center_velocity"] = {"x": velocity_x, "y": velocity_y}
+        features["center_speed"] = float(np.hypot(velocity_x, velocity_y))
+
+        return features
+
 class PoseDetector:
     def __init__(self, config=None):
         if config is None:
             config = {
                 "min_detection_confidence": 0.5,
                 "min_tracking_confidence": 0.5,
-                "model_complexity": 1
+                "model_complexity": 1,
+                "history_size": DEFAULT_HISTORY_SIZE,
+                "feature_window_ms": DEFAULT_FEATURE_WINDOW_MS,
+                "emit_features": True
             }
         
         self.mp_pose = mp.solutions.pose
@@ -38,6 +186,21 @@ class PoseDetector:
         
         self.mp_drawing = mp.solutions.drawing_utils
         
+        # Recent landmarks/flags for windowed features (emitted with each result)
+        # Invalid values fall back to the defaults and are reported in warnings
+        self.warnings = []
+        history_size = config.get("history_size", DEFAULT_HISTORY_SIZE)
+        if not _valid_history_size(history_size):
+            self.warnings.append(f"history_size must be an integer >= 1, got {history_size!r}")
+            history_size = DEFAULT_HISTORY_SIZE
+        self.history = PoseHistory(history_size)
+
+        self.feature_window_ms = config.get("feature_window_ms", DEFAULT_FEATURE_WINDOW_MS)
+        if not _valid_window_ms(self.feature_window_ms):
+            self.warnings.append(f"feature_window_ms must be a number > 0, got {self.feature_window_ms!r}")
+            self.feature_window_ms = DEFAULT_FEATURE_WINDOW_MS
+        self.emit_features = config.get("emit_features", True)
+        
         # Define key body landmarks for full body detection
         self.key_landmarks = [
             self.mp_pose.PoseLandmark.NOSE,
@@ -366,13 +529,26 @@ class PoseDetector:
                     "back_view": back_view_result,
                     "stop_debug": getattr(self, 'stop_debug_info', None)  # Include debug info
                 }
+                
+                self.history.push(time.monotonic(), results.pose_landmarks,
+                                  full_body_visible=is_full_body,
+                                  should_stop=should_stop,
+                                  back_view=back_view_result["is_back_view"])
+            else:
+                self.history.push(time.monotonic())
             
-            return {
+            result = {
                 "success": True,
                 "pose": pose_info,
                 "timestamp": time.time()
             }
             
+            # Windowed features so Node does not need its own per-frame history
+            if self.emit_features:
+                result["features"] = self.history.features(self.feature_window_ms)
+            
+            return result
+            
         except Exception as e:
             return {
                 "success": False,
@@ -383,76 +559,79 @@ class PoseDetector:
 def main():
     """
     Main loop for processing stdin input
-    Expected input: Binary protocol with header
+    Expected input: Binary protocol with header (v1, or v2 after "hello")
     """
     detector = PoseDetector()
+    reader = FrameReader(sys.stdin.buffer)
+    frame_files = FrameFileReader()
 
     try:
         while True:
-            # Read header length (4 bytes)
-            header_length_bytes = sys.stdin.buffer.read(4)
-            if not header_length_bytes or len(header_length_bytes) < 4:
-                break
-
-            # Parse header length
-            header_length = int.from_bytes(header_length_bytes, 'little')
+            try:
+                message = reader.read_message()
+            except FrameError as e:
+                write_response({"error": str(e)}, e.seq)
+                continue
 
-            # Read header
-            header_bytes = sys.stdin.buffer.read(header_length)
-            if not header_bytes or len(header_bytes) < header_length:
+            if message is None:
                 break
 
-            # Parse header JSON
-            try:
-                header = json.loads(header_bytes.decode('utf-8'))
-            except json.JSONDecodeError as e:
-                print(json.dumps({"error": f"Invalid header JSON: {str(e)}"}), flush=True)
-                continue
-                
+            header, image_bytes = message
+            seq = header.get("seq")
+
             if header.get("type") == "process_frame":
-                if header.get("format") == "binary":
-                    # Read binary image data
-                    data_length = header.get("data_length", 0)
-                    image_bytes = sys.stdin.buffer.read(data_length)
-                    
-                    if len(image_bytes) < data_length:
-                        print(json.dumps({"error": "Incomplete image data"}), flush=True)
-                        continue
-                    
-                    # Process binary data directly
+                if header.get("format") in ("binary", "path"):
+                    # Process binary or path-based frame
                     crop_info = header.get("crop_info", None)
-                    
-                    # Convert bytes to numpy array
-                    np_array = np.frombuffer(image_bytes, np.uint8)
-                    if np_array.size == 0:
-                        print(json.dumps({"error": "Empty image data"}), flush=True)
+
+                    try:
+                        image = load_frame(header, image_bytes, frame_files)
+                    except FrameError as e:
+                        write_response({"error": str(e)}, seq)
                         continue
-                    
-                    # Decode image
-                    image = cv2.imdecode(np_array, cv2.IMREAD_COLOR)
                     if image is None:
-                        print(json.dumps({"error": "Failed to decode image"}), flush=True)
+                        write_response({"success": True, "skipped": True, "message": "no new frame"}, seq)
                         continue
-                    
+
                     # Process frame
                     result = detector.process_frame(image, format='numpy', crop_info=crop_info)
-                    
+
                     # Output result
-                    print(json.dumps(result), flush=True)
-                    
+                    write_response(result, seq)
+
+            elif header.get("type") == "features":
+                # Windowed pose features on request
+                window_ms = header.get("window_ms")
+                if window_ms is None:
+                    window_ms = detector.feature_window_ms
+                if not _valid_window_ms(window_ms):
+                    write_response({"error": f"window_ms must be a number > 0, got {window_ms!r}"}, seq)
+                    continue
+                write_response({"success": True, "features": detector.history.features(window_ms)}, seq)
+
+            elif header.get("type") == "hello":
+                # Protocol negotiation
+                protocol = reader.negotiate(header.get("protocol", [1]))
+                write_response({"success": True, "message": "hello", "protocol": protocol}, seq)
+
             elif header.get("type") == "ping":
                 # Health check
-                print(json.dumps({"success": True, "message": "pong"}), flush=True)
-                
+                write_response({"success": True, "message": "pong", **reader.get_stats()}, seq)
+
             elif header.get("type") == "config":
                 # Update configuration
                 new_config = header.get("config", {})
+                # Thread budget/affinity first so the new graph inherits it
+                thread_settings = apply_thread_config(new_config)
                 detector = PoseDetector(new_config)
-                print(json.dumps({"success": True, "message": "config updated"}), flush=True)
-                
+                response = {"success": True, "message": "config updated", "threads": thread_settings}
+                if detector.warnings:
+                    response["warnings"] = detector.warnings
+                write_response(response, seq)
+
             else:
-                print(json.dumps({"error": f"Unknown command type: {header.get('type')}"}), flush=True)
-                
+                write_response({"error": f"Unknown command type: {header.get('type')}"}, seq)
+
     except KeyboardInterrupt:
         pass
     except Exception as e:
@@ -55,12 +55,23 @@ class PoseRouter extends EventEmitter {
         console.log('[PoseRouter] Starting PoseRouter...');
         
         try {
+            // Thread budget / core affinity come from roi.json (pose_detection section)
+            const config = this.roiConfig.get();
+            const poseConfig = (config && config.pose_detection) || {};
+
             // Initialize pose worker
             this.poseWorker = new PoseWorker({
                 fps_limit: 10,
                 min_detection_confidence: 0.5,
                 min_tracking_confidence: 0.5,
-                model_complexity: 1
+                model_complexity: 1,
+                history_size: poseConfig.history_size,
+                feature_window_ms: poseConfig.feature_window_ms,
+                threads: poseConfig.threads,
+                affinity: poseConfig.affinity,
+                protocol: poseConfig.protocol,
+                path_input: poseConfig.path_input,
+                watch_latest: poseConfig.watch_latest
             });
             
             this.poseWorker.on('detection', (data) => {
@@ -149,7 +160,7 @@ class PoseRouter extends EventEmitter {
     }
     
     handlePoseDetection(data) {
-        const { pose, timestamp, cropInfo } = data;
+        const { pose, timestamp, cropInfo, features } = data;
         const now = Date.now();
         
         // Check if recording state (needed for both pose detected and not detected cases)
@@ -335,6 +346,7 @@ class PoseRouter extends EventEmitter {
             confidence: pose.confidence,
             bbox: pose.bbox,
             dwellProgress: this.dwellProgress,
+            features,
             timestamp,
             isRecording: this.frameHandler && this.frameHandler.isRecording
         });
@@ -3,6 +3,7 @@ const { spawn } = require('child_process');
 const { EventEmitter } = require('events');
 const path = require('path');
 const fs = require('fs');
+const { SUPPORTED_PROTOCOLS, encodeV1, encodeFrame, encodePathFrame, encodeCommand } = require('./worker-protocol');
 
 class PoseWorker extends EventEmitter {
     constructor(config = {}) {
@@ -25,6 +26,9 @@ class PoseWorker extends EventEmitter {
         this.frameSkipCounter = 0;
         this.adaptiveFpsEnabled = isARM;
         this.lastCropInfo = null;
+        this.threadSettings = null; // Effective thread/affinity settings reported by Python
+        this.protocolVersion = 1; // stdin framing, upgraded to v2 after hello handshake
+        this.frameSeq = 0;
     }
 
     async start() {
@@ -35,10 +39,12 @@ class PoseWorker extends EventEmitter {
 
         try {
             await this.checkPythonDependencies();
-            this.startPythonProcess();
+            // Mark running first so the initial config command in startPythonProcess is sent
             this.isRunning = true;
+            this.startPythonProcess();
             console.log('[PoseWorker] Started successfully');
         } catch (error) {
+            this.isRunning = false;
             console.error('[PoseWorker] Failed to start:', error);
             throw error;
         }
@@ -87,6 +93,8 @@ class PoseWorker extends EventEmitter {
         this.process = spawn(pythonCmd, [scriptPath], {
             stdio: ['pipe', 'pipe', 'pipe'],
         });
+        this.protocolVersion = 1;
+        this.frameSeq = 0;
 
         this.process.stdout.on('data', (data) => {
             const lines = data.toString().split('\n');
@@ -136,6 +144,11 @@ class PoseWorker extends EventEmitter {
             }
         });
 
+        // Negotiate v2 framing (checksummed, resynchronizable) unless pinned to v1
+        if (this.config.protocol !== 1) {
+            this.sendCommand({ type: 'hello', protocol: SUPPORTED_PROTOCOLS });
+        }
+
         // Send initial configuration
         this.sendCommand({
             type: 'config',
@@ -143,6 +156,10 @@ class PoseWorker extends EventEmitter {
                 min_detection_confidence: this.config.min_detection_confidence,
                 min_tracking_confidence: this.config.min_tracking_confidence,
                 model_complexity: this.config.model_complexity || 1,
+                history_size: this.config.history_size,
+                feature_window_ms: this.config.feature_window_ms,
+                threads: this.config.threads,
+                affinity: this.config.affinity,
             },
         });
     }
@@ -160,13 +177,9 @@ class PoseWorker extends EventEmitter {
             }
 
             // Use binary protocol for all commands
-            const header = JSON.stringify(command);
-            const headerBuffer = Buffer.from(header);
-            const headerLength = Buffer.allocUnsafe(4);
-            headerLength.writeUInt32LE(headerBuffer.length, 0);
-
-            this.process.stdin.write(headerLength);
-            this.process.stdin.write(headerBuffer);
+            const buffers =
+                this.protocolVersion >= 2 ? encodeCommand(this.nextSeq(), command) : encodeV1(command);
+            this.writeBuffers(buffers);
             
             return true;
         } catch (error) {
@@ -175,6 +188,17 @@ class PoseWorker extends EventEmitter {
         }
     }
 
+    nextSeq() {
+        this.frameSeq = (this.frameSeq + 1) >>> 0;
+        return this.frameSeq;
+    }
+
+    writeBuffers(buffers) {
+        for (const buffer of buffers) {
+            this.process.stdin.write(buffer);
+        }
+    }
+
     async processFrame(imageBuffer, cropMode = false) {
         if (!this.isRunning) {
             console.log('[PoseWorker] Skipping frame - worker not running');
@@ -187,6 +211,12 @@ class PoseWorker extends EventEmitter {
             return false;
         }
 
+        return this.submitFrame({ buffer: imageBuffer }, cropMode);
+    }
+
+    // frame: { buffer } for image bytes over the pipe, or { path, size, mtime, latest }
+    // to let the Python worker read the capture file itself
+    submitFrame(frame, cropMode = false) {
         // Rate limiting with adaptive FPS
         const now = Date.now();
         const currentInterval = this.adaptiveFpsEnabled ? this.getAdaptiveInterval() : this.frameInterval;
@@ -220,24 +250,42 @@ class PoseWorker extends EventEmitter {
             
             this.lastCropInfo = cropInfo;
 
-            // Send binary data length and crop info as JSON header
-            const header = JSON.stringify({
-                type: 'process_frame',
-                format: 'binary',
-                data_length: imageBuffer.length,
-                crop_info: cropInfo
-            });
+            let buffers;
+            if (frame.buffer) {
+                const imageBuffer = frame.buffer;
+                // v2: fixed binary header, v1: JSON header with data length
+                buffers =
+                    this.protocolVersion >= 2
+                        ? encodeFrame(this.nextSeq(), imageBuffer, cropInfo)
+                        : encodeV1(
+                              {
+                                  type: 'process_frame',
+                                  format: 'binary',
+                                  data_length: imageBuffer.length,
+                                  crop_info: cropInfo,
+                              },
+                              imageBuffer
+                          );
+            } else {
+                // Path only - no image bytes through the pipe
+                // v2: binary path frame, v1: JSON header with the path
+                buffers =
+                    this.protocolVersion >= 2
+                        ? encodePathFrame(this.nextSeq(), frame, cropInfo)
+                        : encodeV1({
+                              type: 'process_frame',
+                              format: 'path',
+                              path: frame.path,
+                              expected_size: frame.size,
+                              expected_mtime: frame.mtime,
+                              latest: frame.latest || false,
+                              crop_info: cropInfo,
+                          });
+            }
 
-            // Send header length (4 bytes), header, then binary data
-            const headerBuffer = Buffer.from(header);
-            const headerLength = Buffer.allocUnsafe(4);
-            headerLength.writeUInt32LE(headerBuffer.length, 0);
-            
             // Write all data to Python process with error handling
             if (this.process && this.process.stdin && !this.process.stdin.destroyed) {
-                this.process.stdin.write(headerLength);
-                this.process.stdin.write(headerBuffer);
-                this.process.stdin.write(imageBuffer);
+                this.writeBuffers(buffers);
             } else {
                 console.log('[PoseWorker] Process stdin is not available');
                 this.pendingFrames--;
@@ -257,6 +305,11 @@ class PoseWorker extends EventEmitter {
             return false;
         }
 
+        // Let the Python worker read the capture file (no readFileSync + pipe copy)
+        if (this.config.path_input !== false) {
+            return this.processFramePath(imagePath, cropMode);
+        }
+
         try {
             const imageBuffer = fs.readFileSync(imagePath);
 
@@ -272,8 +325,80 @@ class PoseWorker extends EventEmitter {
         }
     }
 
+    processFramePath(imagePath, cropMode = false) {
+        try {
+            // watch_latest: worker follows the capture directory and takes the newest frame
+            if (this.config.watch_latest) {
+                return this.submitFrame(
+                    { path: path.resolve(path.dirname(imagePath)), latest: true },
+                    cropMode
+                );
+            }
+
+            const stats = fs.statSync(imagePath);
+            if (stats.size === 0) {
+                console.log('[PoseWorker] Skipping frame - empty image file:', imagePath);
+                return false;
+            }
+
+            return this.submitFrame(
+                { path: path.resolve(imagePath), size: stats.size, mtime: stats.mtimeMs },
+                cropMode
+            );
+        } catch (error) {
+            console.error('[PoseWorker] Failed to stat image:', error);
+            return false;
+        }
+    }
+
+    // v2 responses echo seq: everything sent up to it has been answered, so the
+    // pending count is last sent - last acknowledged. This also covers frames
+    // skipped by a resync that never get their own response.
+    acknowledge(result) {
+        if (typeof result.seq === 'number') {
+            this.pendingFrames = Math.max(0, this.frameSeq - result.seq);
+            return true;
+        }
+
+        if (this.protocolVersion >= 2 && result.error) {
+            // Framing error without seq - outstanding frames may be lost,
+            // the next acknowledged response recounts them
+            this.pendingFrames = 0;
+            return true;
+        }
+
+        return false;
+    }
+
     handleResult(result) {
-        this.pendingFrames = Math.max(0, this.pendingFrames - 1);
+        const acknowledged = this.acknowledge(result);
+
+        // Control responses are not frame results
+        if (result.message === 'hello') {
+            this.protocolVersion = result.protocol || 1;
+            console.log(`[PoseWorker] Using protocol v${this.protocolVersion}`);
+            return;
+        }
+
+        if (result.threads) {
+            this.threadSettings = result.threads;
+            console.log('[PoseWorker] Thread settings:', JSON.stringify(result.threads));
+            if (result.warnings) {
+                console.warn('[PoseWorker] Config warnings:', result.warnings.join('; '));
+            }
+            return;
+        }
+
+        // Windowed features requested via requestFeatures()
+        if (result.features && !result.pose) {
+            this.emit('features', result.features);
+            return;
+        }
+
+        // v1: one response per frame
+        if (!acknowledged) {
+            this.pendingFrames = Math.max(0, this.pendingFrames - 1);
+        }
 
         if (result.error) {
             console.error('[PoseWorker] Detection error:', result.error);
@@ -285,6 +410,7 @@ class PoseWorker extends EventEmitter {
             // Include crop info if available
             this.emit('detection', {
                 pose: result.pose,
+                features: result.features || null, // Windowed aggregates from Python history
                 timestamp: result.timestamp,
                 frameTime: Date.now(),
                 cropInfo: this.lastCropInfo,
@@ -292,6 +418,12 @@ class PoseWorker extends EventEmitter {
         }
     }
 
+    // Ask for windowed pose features (visibility ratios, torso rotation rate,
+    // body-center velocity) over the last windowMs; answered via 'features' event
+    requestFeatures(windowMs = 1000) {
+        return this.sendCommand({ type: 'features', window_ms: windowMs });
+    }
+
     ping() {
         return this.sendCommand({ type: 'ping' });
     }
@@ -306,6 +438,10 @@ class PoseWorker extends EventEmitter {
                 min_detection_confidence: this.config.min_detection_confidence,
                 min_tracking_confidence: this.config.min_tracking_confidence,
                 model_complexity: this.config.model_complexity || 1,
+                history_size: this.config.history_size,
+                feature_window_ms: this.config.feature_window_ms,
+                threads: this.config.threads,
+                affinity: this.config.affinity,
             },
         });
     }
@@ -360,6 +496,8 @@ class PoseWorker extends EventEmitter {
             lastProcessTime: this.lastProcessTime,
             frameSkipCounter: this.frameSkipCounter,
             adaptiveFpsEnabled: this.adaptiveFpsEnabled,
+            threadSettings: this.threadSettings,
+            protocolVersion: this.protocolVersion,
             currentFps: this.frameInterval > 0 ? Math.round(1000 / this.getAdaptiveInterval()) : 0,
         };
     }
@@ -79,6 +79,65 @@ class ROIConfig extends EventEmitter {
                 throw new Error(`Invalid ${roiName}: x1,y1 must be < x2,y2`);
             }
         });
+
+        // Validate worker thread budget / core affinity
+        ['hand_detection', 'pose_detection'].forEach((section) => {
+            const workerConfig = config[section];
+            if (!workerConfig) {
+                return;
+            }
+
+            const threads = workerConfig.threads;
+            if (threads !== undefined) {
+                if (typeof threads !== 'object' || threads === null || Array.isArray(threads)) {
+                    throw new Error(`Invalid ${section}.threads: must be an object`);
+                }
+                [
+                    ['opencv', 0],
+                    ['inference', 1],
+                ].forEach(([key, min]) => {
+                    if (
+                        key in threads &&
+                        (!Number.isInteger(threads[key]) || threads[key] < min)
+                    ) {
+                        throw new Error(`Invalid ${section}.threads.${key}: must be integer >= ${min}`);
+                    }
+                });
+            }
+
+            const affinity = workerConfig.affinity;
+            if (affinity !== undefined) {
+                const validList =
+                    Array.isArray(affinity) &&
+                    affinity.every((core) => Number.isInteger(core) && core >= 0);
+                const validString =
+                    typeof affinity === 'string' && /^\s*\d+(-\d+)?(\s*,\s*\d+(-\d+)?)*\s*$/.test(affinity);
+                if (!validList && !validString && !(Number.isInteger(affinity) && affinity >= 0)) {
+                    throw new Error(
+                        `Invalid ${section}.affinity: must be core list like [2, 3] or "2-3"`
+                    );
+                }
+            }
+        });
+
+        // Validate pose history / feature window
+        const poseConfig = config.pose_detection;
+        if (poseConfig) {
+            if (
+                poseConfig.history_size !== undefined &&
+                (!Number.isInteger(poseConfig.history_size) || poseConfig.history_size < 1)
+            ) {
+                throw new Error('Invalid pose_detection.history_size: must be integer >= 1');
+            }
+            if (
+                poseConfig.feature_window_ms !== undefined &&
+                (typeof poseConfig.feature_window_ms !== 'number' ||
+                    !Number.isFinite(poseConfig.feature_window_ms) ||
+                    poseConfig.feature_window_ms <= 0)
+            ) {
+                throw new Error('Invalid pose_detection.feature_window_ms: must be number > 0');
+            }
+        }
     }
 
     getDefaultConfig() {
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# backend/src/test/hand-crop-test.py
+# Pose-guided hand crop geometry test: get_hand_crop() and the mapping of
+# crop-local landmarks back to frame coordinates in extract_hand_info()
+
+import os
+import sys
+import importlib.util
+from types import SimpleNamespace
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, SRC_DIR)
+
+spec = importlib.util.spec_from_file_location("hand_detection", os.path.join(SRC_DIR, "hand-detection.py"))
+hand_detection = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(hand_detection)
+
+PoseLandmark = hand_detection.mp.solutions.pose.PoseLandmark
+
+WIDTH = 640
+HEIGHT = 480
+
+
+def make_detector():
+    # Crop geometry needs no MediaPipe graphs, only the arm landmark ids
+    detector = hand_detection.HandDetector.__new__(hand_detection.HandDetector)
+    detector.arm_landmarks = {
+        "left": (PoseLandmark.LEFT_WRIST, PoseLandmark.LEFT_ELBOW, PoseLandmark.LEFT_INDEX),
+        "right": (PoseLandmark.RIGHT_WRIST, PoseLandmark.RIGHT_ELBOW, PoseLandmark.RIGHT_INDEX),
+    }
+    return detector
+
+
+def make_pose(wrist, elbow, index, wrist_visibility=1.0, index_visibility=1.0):
+    """Pose with the right arm at the given normalized positions"""
+    landmarks = [SimpleNamespace(x=0.0, y=0.0, z=0.0, visibility=0.0) for _ in range(33)]
+    landmarks[PoseLandmark.RIGHT_WRIST] = SimpleNamespace(x=wrist[0], y=wrist[1], z=0.0, visibility=wrist_visibility)
+    landmarks[PoseLandmark.RIGHT_ELBOW] = SimpleNamespace(x=elbow[0], y=elbow[1], z=0.0, visibility=1.0)
+    landmarks[PoseLandmark.RIGHT_INDEX] = SimpleNamespace(x=index[0], y=index[1], z=0.0, visibility=index_visibility)
+    return SimpleNamespace(landmark=landmarks)
+
+
+def make_hand(points):
+    """21 hand landmarks; the given points fill the first entries"""
+    landmarks = [SimpleNamespace(x=0.5, y=0.5, z=0.0) for _ in range(21)]
+    for i, (x, y, z) in enumerate(points):
+        landmarks[i] = SimpleNamespace(x=x, y=y, z=z)
+    handedness = SimpleNamespace(classification=[SimpleNamespace(label="Right", score=0.9)])
+    return SimpleNamespace(landmark=landmarks), handedness
+
+
+def expect_close(actual, expected, message, tolerance=1e-9):
+    if abs(actual - expected) > tolerance:
+        raise AssertionError(f"{message}: {actual} != {expected}")
+
+
+def test_crop_from_pose():
+    # Wrist (320, 240), elbow 120 px below, index 24 px above the wrist:
+    # hand size = max(24 * 2, 120 * 0.7) = 84, center between wrist and index
+    pose = make_pose(wrist=(0.5, 0.5), elbow=(0.5, 0.75), index=(0.5, 0.45))
+    crop = make_detector().get_hand_crop(pose, "right", WIDTH, HEIGHT)
+    assert crop == (236, 144, 404, 312), f"unexpected crop {crop}"
+
+
+def test_crop_without_index():
+    # Index not visible: center continues along the forearm by half a hand size
+    pose = make_pose(wrist=(0.5, 0.5), elbow=(0.5, 0.75), index=(0.5, 0.45), index_visibility=0.0)
+    crop = make_detector().get_hand_crop(pose, "right", WIDTH, HEIGHT)
+    assert crop == (236, 114, 404, 282), f"unexpected crop {crop}"
+
+
+def test_crop_hidden_wrist():
+    pose = make_pose(wrist=(0.5, 0.5), elbow=(0.5, 0.75), index=(0.5, 0.45), wrist_visibility=0.2)
+    assert make_detector().get_hand_crop(pose, "right", WIDTH, HEIGHT) is None, "hidden wrist must not crop"
+
+
+def test_crop_clipped_below_minimum():
+    # Hand leaving the frame to the right: the 168 px crop is clipped to
+    # x 630..640, narrower than the 16 px minimum
+    pose = make_pose(wrist=(1.05, 0.5), elbow=(0.8625, 0.5), index=(1.05, 0.5), index_visibility=0.0)
+    assert make_detector().get_hand_crop(pose, "right", WIDTH, HEIGHT) is None, "clipped crop must be rejected"
+
+    # Same arm one hand size further in still yields a (clipped) crop
+    pose = make_pose(wrist=(0.95, 0.5), elbow=(0.7625, 0.5), index=(0.95, 0.5), index_visibility=0.0)
+    crop = make_detector().get_hand_crop(pose, "right", WIDTH, HEIGHT)
+    assert crop is not None and crop[2] == WIDTH, f"unexpected crop {crop}"
+
+
+def test_landmarks_mapped_to_frame():
+    detector = make_detector()
+    hand_landmarks, handedness = make_hand([(0.0, 0.0, 0.0), (1.0, 1.0, 0.0), (0.5, 0.5, 0.1)])
+
+    info = detector.extract_hand_info(hand_landmarks, handedness, crop_box=(236, 144, 404, 312, WIDTH, HEIGHT))
+    landmarks = info["landmarks"]
+
+    # Crop corners land on the crop box in frame coordinates
+    expect_close(landmarks[0]["x"], 236 / WIDTH, "top-left x")
+    expect_close(landmarks[0]["y"], 144 / HEIGHT, "top-left y")
+    expect_close(landmarks[1]["x"], 404 / WIDTH, "bottom-right x")
+    expect_close(landmarks[1]["y"], 312 / HEIGHT, "bottom-right y")
+
+    # Crop center is the wrist/index midpoint the crop was built around
+    expect_close(landmarks[2]["x"], 320 / WIDTH, "center x")
+    expect_close(landmarks[2]["y"], 228 / HEIGHT, "center y")
+    expect_close(landmarks[2]["z"], 0.1 * 168 / WIDTH, "depth scaled with crop width")
+
+    expect_close(info["bbox"]["x1"], 236 / WIDTH, "bbox x1")
+    expect_close(info["bbox"]["y2"], 312 / HEIGHT, "bbox y2")
+
+
+def test_landmarks_without_crop():
+    hand_landmarks, handedness = make_hand([(0.25, 0.75, 0.0)])
+    info = make_detector().extract_hand_info(hand_landmarks, handedness)
+    expect_close(info["landmarks"][0]["x"], 0.25, "x unchanged")
+    expect_close(info["landmarks"][0]["y"], 0.75, "y unchanged")
+
+
+TESTS = [
+    ("Crop from pose arm", test_crop_from_pose),
+    ("Crop without index landmark", test_crop_without_index),
+    ("Hidden wrist", test_crop_hidden_wrist),
+    ("Clipped crop below minimum size", test_crop_clipped_below_minimum),
+    ("Crop landmarks mapped to frame", test_landmarks_mapped_to_frame),
+    ("Landmarks without crop", test_landmarks_without_crop),
+]
+
+
+def run_all_tests():
+    print("🚀 Starting Hand Crop Tests")
+    print("=" * 60)
+
+    passed = 0
+    for name, test in TESTS:
+        try:
+            test()
+            passed += 1
+            print(f"✅ {name}")
+        except AssertionError as e:
+            print(f"❌ {name}: {e}")
+
+    print("=" * 60)
+    print(f"✅ Passed: {passed}/{len(TESTS)}")
+    print(f"❌ Failed: {len(TESTS) - passed}/{len(TESTS)}")
+
+    return passed == len(TESTS)
+
+
+if __name__ == "__main__":
+    try:
+        sys.exit(0 if run_all_tests() else 1)
+    except Exception as e:
+        print(f"💥 Test runner crashed: {e}")
+        sys.exit(2)
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# backend/src/test/pose-history-test.py
+# PoseHistory ring buffer test: wrap-around, window edges, visibility
+# ratios and the signs of torso rotation rate / body-center velocity
+
+import os
+import sys
+import importlib.util
+from types import SimpleNamespace
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, SRC_DIR)
+
+spec = importlib.util.spec_from_file_location("pose_detection", os.path.join(SRC_DIR, "pose-detection.py"))
+pose_detection = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(pose_detection)
+
+PoseHistory = pose_detection.PoseHistory
+
+T0 = 100.0
+
+
+def make_pose(center_x=0.5, center_y=0.5, shoulder_dz=0.0):
+    """
+    Pose with shoulders/hips around (center_x, center_y)
+    shoulder_dz: left shoulder depth minus right shoulder depth (torso yaw)
+    """
+    landmarks = [SimpleNamespace(x=center_x, y=center_y, z=0.0, visibility=1.0) for _ in range(33)]
+    landmarks[PoseHistory.LEFT_SHOULDER] = SimpleNamespace(
+        x=center_x + 0.1, y=center_y - 0.1, z=shoulder_dz / 2, visibility=1.0)
+    landmarks[PoseHistory.RIGHT_SHOULDER] = SimpleNamespace(
+        x=center_x - 0.1, y=center_y - 0.1, z=-shoulder_dz / 2, visibility=1.0)
+    landmarks[PoseHistory.LEFT_HIP] = SimpleNamespace(x=center_x + 0.1, y=center_y + 0.1, z=0.0, visibility=1.0)
+    landmarks[PoseHistory.RIGHT_HIP] = SimpleNamespace(x=center_x - 0.1, y=center_y + 0.1, z=0.0, visibility=1.0)
+    return SimpleNamespace(landmark=landmarks)
+
+
+def expect_close(actual, expected, message, tolerance=1e-4):
+    if abs(actual - expected) > tolerance:
+        raise AssertionError(f"{message}: {actual} != {expected}")
+
+
+def test_ring_wrap_around():
+    history = PoseHistory(4)
+    for i in range(6):
+        history.push(T0 + i)
+
+    idx = history.window_indices(60000, T0 + 5)
+    assert history.count == 4, f"count {history.count}"
+    assert list(history.timestamps[idx]) == [T0 + 2, T0 + 3, T0 + 4, T0 + 5], \
+        f"unexpected window {list(history.timestamps[idx])}"
+
+
+def test_window_edges():
+    history = PoseHistory(16)
+    for i in range(10):
+        history.push(T0 + i)
+
+    # Frame exactly at now - window is inside the window
+    idx = history.window_indices(3000, T0 + 9)
+    assert list(history.timestamps[idx]) == [T0 + 6, T0 + 7, T0 + 8, T0 + 9], "inclusive window start"
+
+    assert len(history.window_indices(500, T0 + 9)) == 1, "only the newest frame"
+    assert len(history.window_indices(1000, T0 + 20)) == 0, "window after the last frame"
+    assert len(PoseHistory(8).window_indices(1000, T0)) == 0, "empty history"
+
+    features = history.features(1000, now=T0 + 20)
+    assert features["frames"] == 0 and features["detected_ratio"] == 0.0, "empty window features"
+
+
+def test_ratios():
+    history = PoseHistory(8)
+    # 4 frames: pose in 3, full body in 2, stop in 1, back view in 1
+    history.push(T0, make_pose(), full_body_visible=True)
+    history.push(T0 + 0.1, make_pose(), full_body_visible=True, should_stop=True)
+    history.push(T0 + 0.2)
+    history.push(T0 + 0.3, make_pose(), back_view=True)
+
+    features = history.features(1000, now=T0 + 0.3)
+    assert features["frames"] == 4, f"frames {features['frames']}"
+    expect_close(features["detected_ratio"], 0.75, "detected ratio")
+    expect_close(features["full_body_ratio"], 0.5, "full body ratio")
+    expect_close(features["stop_ratio"], 0.25, "stop ratio")
+    expect_close(features["back_view_ratio"], 0.25, "back view ratio")
+
+
+def test_rotation_rate_sign():
+    for direction in (1, -1):
+        history = PoseHistory(16)
+        for i in range(10):
+            history.push(T0 + i * 0.1, make_pose(shoulder_dz=direction * 0.02 * i))
+        # A frame without pose must not affect the motion features
+        history.push(T0 + 1.0)
+
+        rate = history.features(2000, now=T0 + 1.0)["torso_rotation_rate"]
+        assert rate * direction > 0, f"rotation rate {rate} for direction {direction}"
+
+
+def test_center_velocity():
+    history = PoseHistory(8)
+    # Ring wraps: only the last 8 of 12 frames are used
+    for i in range(12):
+        t = i * 0.1
+        history.push(T0 + t, make_pose(center_x=0.3 + 0.1 * t, center_y=0.6 - 0.05 * t))
+
+    features = history.features(5000, now=T0 + 1.1)
+    assert features["frames"] == 8, f"frames {features['frames']}"
+    expect_close(features["center_velocity"]["x"], 0.1, "velocity x")
+    expect_close(features["center_velocity"]["y"], -0.05, "velocity y")
+    expect_close(features["center_speed"], (0.1 ** 2 + 0.05 ** 2) ** 0.5, "speed")
+    expect_close(features["torso_rotation_rate"], 0.0, "no rotation")
+
+
+def test_invalid_capacity():
+    for capacity in (0, -1, "64", 2.5, True):
+        try:
+            PoseHistory(capacity)
+        except ValueError:
+            continue
+        raise AssertionError(f"capacity {capacity!r} accepted")
+
+
+TESTS = [
+    ("Ring wrap-around", test_ring_wrap_around),
+    ("Window edges", test_window_edges),
+    ("Visibility ratios", test_ratios),
+    ("Torso rotation rate sign", test_rotation_rate_sign),
+    ("Body-center velocity", test_center_velocity),
+    ("Invalid capacity", test_invalid_capacity),
+]
+
+
+def run_all_tests():
+    print("🚀 Starting Pose History Tests")
+    print("=" * 60)
+
+    passed = 0
+    for name, test in TESTS:
+        try:
+            test()
+            passed += 1
+            print(f"✅ {name}")
+        except AssertionError as e:
+            print(f"❌ {name}: {e}")
+
+    print("=" * 60)
+    print(f"✅ Passed: {passed}/{len(TESTS)}")
+    print(f"❌ Failed: {len(TESTS) - passed}/{len(TESTS)}")
+
+    return passed == len(TESTS)
+
+
+if __name__ == "__main__":
+    try:
+        sys.exit(0 if run_all_tests() else 1)
+    except Exception as e:
+        print(f"💥 Test runner crashed: {e}")
+        sys.exit(2)
@@ -0,0 +1,256 @@
+#!/usr/bin/env node
+// backend/src/test/worker-protocol-test.js
+// Worker stdin protocol test: frames encoded by worker-protocol.js (Node)
+// are decoded by FrameReader in detector_common.py (Python)
+
+const path = require('path');
+const { spawnSync } = require('child_process');
+
+const {
+    SUPPORTED_PROTOCOLS,
+    encodeV1,
+    encodeFrame,
+    encodePathFrame,
+    encodeCommand,
+} = require('../worker-protocol');
+
+const SRC_DIR = path.join(__dirname, '..');
+
+// Decodes stdin with FrameReader and prints one JSON line per message/error
+const DECODER = `
+import sys, json
+from detector_common import FRAME_HEADER, FRAME_HEADER_SIZE, FrameError, FrameFileReader, FrameReader, load_frame
+
+print(json.dumps({"fixed_size": FRAME_HEADER.size, "header_size": FRAME_HEADER_SIZE}))
+reader = FrameReader(sys.stdin.buffer)
+frame_files = FrameFileReader()
+while True:
+    try:
+        message = reader.read_message()
+    except FrameError as e:
+        print(json.dumps({"error": str(e), "seq": e.seq}))
+        continue
+    if message is None:
+        break
+    header, payload = message
+    if header.get("type") == "hello":
+        reader.negotiate(header.get("protocol", [1]))
+    if header.get("format") == "path":
+        try:
+            load_frame(header, payload, frame_files)
+        except FrameError as e:
+            header["load_error"] = str(e)
+    header["payload"] = payload.decode("latin-1") if payload is not None else None
+    print(json.dumps(header))
+print(json.dumps({"stats": reader.get_stats()}))
+`;
+
+const CROP = { offsetX: 1 / 3, offsetY: 0, scaleX: 1 / 3, scaleY: 1 };
+const ROI = {
+    start_roi: { x1: 0.7, y1: 0.05, x2: 0.95, y2: 0.4 },
+    stop_roi: { x1: 0.05, y1: 0.05, x2: 0.3, y2: 0.4 },
+};
+
+function hello() {
+    return encodeV1({ type: 'hello', protocol: SUPPORTED_PROTOCOLS });
+}
+
+function decode(buffers) {
+    const pythonCmd = process.platform === 'win32' ? 'python' : 'python3';
+    const result = spawnSync(pythonCmd, ['-c', DECODER], {
+        cwd: SRC_DIR,
+        env: { ...process.env, PYTHONPATH: [SRC_DIR, process.env.PYTHONPATH].filter(Boolean).join(path.delimiter) },
+        input: Buffer.concat(buffers.flat()),
+    });
+
+    if (result.status !== 0) {
+        throw new Error(`Python decoder failed: ${result.stderr.toString()}`);
+    }
+
+    const lines = result.stdout
+        .toString()
+        .split('\n')
+        .filter((line) => line.trim())
+        .map((line) => JSON.parse(line));
+
+    return {
+        layout: lines[0],
+        messages: lines.slice(1, -1),
+        stats: lines[lines.length - 1].stats,
+    };
+}
+
+function expect(condition, message) {
+    if (!condition) {
+        throw new Error(message);
+    }
+}
+
+const TESTS = [
+    {
+        name: 'Header layout',
+        run() {
+            const [header, payload] = encodeFrame(7, Buffer.from('jpeg'), CROP, ROI);
+            const { layout } = decode([]);
+
+            expect(layout.fixed_size === 120, `Python fixed header is ${layout.fixed_size} bytes`);
+            expect(header.length === layout.header_size, `Node header ${header.length} != Python ${layout.header_size}`);
+            expect(header.subarray(0, 4).toString('ascii') === 'CMF2', 'magic word');
+            expect(header.readUInt8(4) === 2, 'version');
+            expect(header.readUInt32LE(8) === 7, 'seq');
+            expect(header.readUInt32LE(16) === payload.length, 'payload length');
+            expect(header.readDoubleLE(24) === CROP.offsetX, 'crop offsetX');
+            expect(header.readDoubleLE(88) === ROI.stop_roi.x1, 'stop ROI x1');
+        },
+    },
+    {
+        name: 'v1 until hello, then v2',
+        run() {
+            const { messages, stats } = decode([
+                encodeV1(
+                    { type: 'process_frame', format: 'binary', data_length: 2, crop_info: null },
+                    Buffer.from('v1')
+                ),
+                hello(),
+                encodeFrame(1, Buffer.from('v2-frame'), CROP, ROI),
+                encodeCommand(2, { type: 'ping' }),
+            ]);
+
+            expect(messages.length === 4, `expected 4 messages, got ${messages.length}`);
+            expect(messages[0].payload === 'v1' && messages[0].seq === undefined, 'v1 frame');
+            expect(messages[1].type === 'hello', 'hello');
+            expect(messages[2].payload === 'v2-frame' && messages[2].seq === 1, 'v2 frame');
+            expect(messages[2].crop_info.offsetX === CROP.offsetX, 'crop round trip');
+            expect(messages[2].roi_info.bbox.x2 === 0.95, 'ROI bbox');
+            expect(messages[3].type === 'ping' && messages[3].seq === 2, 'v2 command');
+            expect(stats.protocol === 2 && stats.resyncs === 0, 'no resync');
+        },
+    },
+    {
+        name: 'Binary path frames',
+        run() {
+            const { messages } = decode([
+                hello(),
+                encodePathFrame(1, { path: '/nonexistent/frame1.jpg', size: 1234, mtime: 1700000000123.5 }, CROP),
+                encodePathFrame(2, { path: '/nonexistent', latest: true }, null, ROI),
+            ]);
+
+            const [, file, latest] = messages;
+            expect(file.format === 'path' && file.seq === 1, 'path frame');
+            expect(file.path === '/nonexistent/frame1.jpg' && !file.latest, 'path');
+            expect(file.expected_size === 1234 && file.expected_mtime === 1700000000123.5, 'size/mtime');
+            expect(file.crop_info.scaleX === CROP.scaleX && file.payload === null, 'crop, no payload');
+            expect(file.load_error.includes('Failed to open'), 'missing file is a frame error');
+            expect(latest.latest && latest.expected_size === undefined, 'latest without size/mtime');
+            expect(latest.roi_info.start_roi.x1 === ROI.start_roi.x1, 'ROI');
+        },
+    },
+    {
+        name: 'Malformed path messages',
+        run() {
+            const { messages } = decode([
+                encodeV1({ type: 'process_frame', format: 'path' }),
+                encodeV1({ type: 'process_frame', format: 'path', path: '/tmp/x.jpg', expected_size: '12' }),
+                encodeV1({ type: 'process_frame', format: 'path', latest: true, path: 5 }),
+            ]);
+
+            expect(messages.length === 3, `expected 3 messages, got ${messages.length}`);
+            expect(messages[0].load_error.includes('Invalid frame path'), 'missing path');
+            expect(messages[1].load_error.includes('Invalid expected_size'), 'non-numeric size');
+            expect(messages[2].load_error.includes('Invalid frame directory'), 'non-string directory');
+        },
+    },
+    {
+        name: 'Corrupted header resyncs at next frame',
+        run() {
+            const damaged = encodeFrame(1, Buffer.from('first'));
+            damaged[0][12] ^= 0xff; // ext_length, covered by header crc
+
+            const { messages, stats } = decode([
+                hello(),
+                damaged,
+                encodeFrame(2, Buffer.from('second')),
+            ]);
+
+            const errors = messages.filter((m) => m.error);
+            const frames = messages.filter((m) => m.type === 'process_frame');
+            expect(errors.length >= 1 && errors[0].error.includes('header checksum'), 'header error');
+            expect(errors.every((e) => e.seq === null), 'untrusted header has no seq');
+            expect(frames.length === 1 && frames[0].seq === 2, 'next frame decoded');
+            expect(stats.resyncs >= 1, 'resync counted');
+        },
+    },
+    {
+        name: 'Truncated payload',
+        run() {
+            const truncated = encodeFrame(1, Buffer.from('payload-one'));
+            truncated[1] = truncated[1].subarray(0, 6); // bytes lost in the pipe
+
+            const { messages } = decode([
+                hello(),
+                truncated,
+                encodeFrame(2, Buffer.from('payload-two')),
+                encodeFrame(3, Buffer.from('payload-three')),
+            ]);
+
+            const frames = messages.filter((m) => m.type === 'process_frame');
+            const errors = messages.filter((m) => m.error);
+            expect(errors.length === 1, `expected 1 error, got ${errors.length}`);
+            expect(errors[0].error.includes('Payload checksum') && errors[0].seq === 1, 'payload error with seq');
+            expect(frames.map((f) => f.seq).join() === '2,3', 'only the damaged frame is lost');
+            expect(frames[0].payload === 'payload-two', 'next frame intact');
+        },
+    },
+    {
+        name: 'Oversized v1 header length',
+        run() {
+            // JPEG bytes read as a header length (0xE0FFD8FF, ~3.7 GB)
+            const { messages } = decode([Buffer.from([0xff, 0xd8, 0xff, 0xe0, 0x00, 0x10])]);
+            expect(messages.length === 1 && messages[0].error.includes('Invalid header length'), 'length rejected');
+        },
+    },
+    {
+        name: 'Truncated at end of stream',
+        run() {
+            const truncated = encodeFrame(1, Buffer.from('payload-one'));
+            truncated[1] = truncated[1].subarray(0, 4);
+
+            const { messages } = decode([hello(), truncated]);
+            expect(messages.length === 1 && messages[0].type === 'hello', 'clean EOF');
+        },
+    },
+];
+
+function runAllTests() {
+    console.log('🚀 Starting Worker Protocol Tests');
+    console.log('='.repeat(60));
+
+    let passedTests = 0;
+    for (const test of TESTS) {
+        try {
+            test.run();
+            passedTests++;
+            console.log(`✅ ${test.name}`);
+        } catch (error) {
+            console.log(`❌ ${test.name}: ${error.message}`);
+        }
+    }
+
+    console.log('='.repeat(60));
+    console.log(`✅ Passed: ${passedTests}/${TESTS.length}`);
+    console.log(`❌ Failed: ${TESTS.length - passedTests}/${TESTS.length}`);
+
+    return passedTests === TESTS.length;
+}
+
+// Run tests if called directly
+if (require.main === module) {
+    try {
+        process.exit(runAllTests() ? 0 : 1);
+    } catch (error) {
+        console.error('💥 Test runner crashed:', error);
+        process.exit(2);
+    }
+}
+
+module.exports = { runAllTests };
@@ -0,0 +1,146 @@
+// backend/src/worker-protocol.js
+// stdin framing for the Python detector workers (hand-detection.py / pose-detection.py)
+//
+// v1: [u32 header_length][JSON header][payload]
+// v2: [fixed header][u32 header_crc][JSON ext][payload]
+//     The fixed header carries magic, version, type, flags, sequence number,
+//     lengths, payload crc32 and crop/ROI boxes, so process_frame needs no JSON.
+//     Path frames carry [u64 size][f64 mtime][UTF-8 path] as payload.
+//     After corruption the worker resyncs at the next magic word.
+const zlib = require('zlib');
+
+const PROTOCOL_MAGIC = Buffer.from('CMF2', 'ascii');
+const PROTOCOL_VERSION = 2;
+const SUPPORTED_PROTOCOLS = [2, 1];
+
+const FRAME_TYPE_PROCESS = 1;
+const FRAME_TYPE_COMMAND = 2;
+const FRAME_TYPE_PATH = 3;
+
+const FRAME_FLAG_CROP = 0x1;
+const FRAME_FLAG_ROI = 0x2;
+const FRAME_FLAG_LATEST = 0x4;
+const FRAME_FLAG_EXPECTED = 0x8;
+
+// Must match FRAME_HEADER ("<4sBBHIIII12d") in detector_common.py
+const FRAME_HEADER_SIZE = 4 + 1 + 1 + 2 + 4 * 4 + 12 * 8;
+const FRAME_TOTAL_HEADER_SIZE = FRAME_HEADER_SIZE + 4;
+
+// Must match FRAME_PATH_FIELDS ("<Qd") in detector_common.py
+const FRAME_PATH_FIELDS_SIZE = 8 + 8;
+
+const EMPTY_BUFFER = Buffer.alloc(0);
+
+// zlib.crc32 is only available on newer Node versions
+let crcTable = null;
+function crc32(buffer, value = 0) {
+    if (typeof zlib.crc32 === 'function') {
+        return zlib.crc32(buffer, value);
+    }
+
+    if (!crcTable) {
+        crcTable = new Int32Array(256);
+        for (let i = 0; i < 256; i++) {
+            let c = i;
+            for (let k = 0; k < 8; k++) {
+                c = c & 1 ? 0xedb88320 ^ (c >>> 1) : c >>> 1;
+            }
+            crcTable[i] = c;
+        }
+    }
+
+    let crc = ~value;
+    for (let i = 0; i < buffer.length; i++) {
+        crc = crcTable[(crc ^ buffer[i]) & 0xff] ^ (crc >>> 8);
+    }
+    return ~crc >>> 0;
+}
+
+// v1: length-prefixed JSON header followed by optional payload
+function encodeV1(header, payload = null) {
+    const headerBuffer = Buffer.from(JSON.stringify(header));
+    const headerLength = Buffer.allocUnsafe(4);
+    headerLength.writeUInt32LE(headerBuffer.length, 0);
+
+    return payload ? [headerLength, headerBuffer, payload] : [headerLength, headerBuffer];
+}
+
+function writeBox(header, offset, box) {
+    header.writeDoubleLE(box.x1, offset);
+    header.writeDoubleLE(box.y1, offset + 8);
+    header.writeDoubleLE(box.x2, offset + 16);
+    header.writeDoubleLE(box.y2, offset + 24);
+}
+
+function encodeV2(type, seq, ext, payload, cropInfo = null, roiInfo = null, flags = 0) {
+    const header = Buffer.alloc(FRAME_TOTAL_HEADER_SIZE);
+
+    PROTOCOL_MAGIC.copy(header, 0);
+    header.writeUInt8(PROTOCOL_VERSION, 4);
+    header.writeUInt8(type, 5);
+    header.writeUInt32LE(seq >>> 0, 8);
+    header.writeUInt32LE(ext.length, 12);
+    header.writeUInt32LE(payload.length, 16);
+    header.writeUInt32LE(crc32(payload, crc32(ext)), 20);
+
+    // Fixed fields: crop (offsetX, offsetY, scaleX, scaleY), start ROI, stop ROI
+    if (cropInfo) {
+        flags |= FRAME_FLAG_CROP;
+        header.writeDoubleLE(cropInfo.offsetX, 24);
+        header.writeDoubleLE(cropInfo.offsetY, 32);
+        header.writeDoubleLE(cropInfo.scaleX, 40);
+        header.writeDoubleLE(cropInfo.scaleY, 48);
+    }
+    if (roiInfo) {
+        flags |= FRAME_FLAG_ROI;
+        writeBox(header, 56, roiInfo.start_roi);
+        writeBox(header, 88, roiInfo.stop_roi);
+    }
+    header.writeUInt16LE(flags, 6);
+
+    header.writeUInt32LE(crc32(header.subarray(0, FRAME_HEADER_SIZE)), FRAME_HEADER_SIZE);
+
+    const buffers = [header];
+    if (ext.length > 0) buffers.push(ext);
+    if (payload.length > 0) buffers.push(payload);
+    return buffers;
+}
+
+// v2 process_frame: binary fields only, no JSON on the hot path
+function encodeFrame(seq, payload, cropInfo = null, roiInfo = null) {
+    return encodeV2(FRAME_TYPE_PROCESS, seq, EMPTY_BUFFER, payload, cropInfo, roiInfo);
+}
+
+// v2 path frame: the worker reads the capture file itself
+// frame: { path, size, mtime } or { path: directory, latest: true }
+function encodePathFrame(seq, frame, cropInfo = null, roiInfo = null) {
+    const pathBuffer = Buffer.from(frame.path, 'utf8');
+    const payload = Buffer.alloc(FRAME_PATH_FIELDS_SIZE + pathBuffer.length);
+    let flags = 0;
+
+    if (frame.latest) {
+        flags |= FRAME_FLAG_LATEST;
+    } else if (typeof frame.size === 'number' && typeof frame.mtime === 'number') {
+        flags |= FRAME_FLAG_EXPECTED;
+        payload.writeBigUInt64LE(BigInt(frame.size), 0);
+        payload.writeDoubleLE(frame.mtime, 8);
+    }
+    pathBuffer.copy(payload, FRAME_PATH_FIELDS_SIZE);
+
+    return encodeV2(FRAME_TYPE_PATH, seq, EMPTY_BUFFER, payload, cropInfo, roiInfo, flags);
+}
+
+// v2 command: JSON in the ext section, no payload
+function encodeCommand(seq, command) {
+    return encodeV2(FRAME_TYPE_COMMAND, seq, Buffer.from(JSON.stringify(command)), EMPTY_BUFFER);
+}
+
+module.exports = {
+    PROTOCOL_VERSION,
+    SUPPORTED_PROTOCOLS,
+    crc32,
+    encodeV1,
+    encodeFrame,
+    encodePathFrame,
+    encodeCommand,
+};